@@ -0,0 +1,272 @@
+"""
+Synthetic-instance benchmark of the scheduling pipeline.
+
+Generates Employees, Shifts, Absence_Requests and Official_Schedule tabs at a
+given scale into an in-memory LocalStorage, then runs the pipeline through
+Scheduler with a fixed "today" and no network access, timing each phase.
+Results are appended to config.BENCHMARK_DIR/<scale>.json and compared to the
+baseline stored there; the run fails when a phase regressed by more than
+config.BENCHMARK_REGRESSION_THRESHOLD.
+
+Usage: python benchmark.py [--scale small|medium|large] [--repeat N]
+       [--today YYYY-MM-DD] [--time-limit SECONDS] [--threshold RATIO]
+       [--update-baseline] [--verbose]
+"""
+from contextlib import contextmanager, redirect_stdout
+from datetime import date, datetime
+import calendar
+import io
+import json
+import os
+import random
+import sys
+import time
+import config
+from mailer import Mailer
+from model_builder import ScheduleModelBuilder
+from schedule_diff import diff_schedules
+from scheduler_class import Scheduler
+from storage import LocalStorage
+
+SCALES = {
+    'small': dict(num_employees=40, num_shifts=8, requests_per_employee=0.5),
+    'medium': dict(num_employees=150, num_shifts=20, requests_per_employee=0.5),
+    'large': dict(num_employees=500, num_shifts=60, requests_per_employee=0.5),
+}
+ROLES = ['Infirmier', 'ASSC', 'Aide-soignant']
+DEFAULT_TODAY = date(2025, 10, 1) # A 31-day month, with only day 1 locked
+PHASES = ['load', 'build', 'solve', 'diff', 'offers', 'finalize', 'redistribute']
+OFFERS_HEADER = [
+    config.COL_OFFER_ID, config.COL_OFFER_EMPLOYEE, config.COL_OFFER_STATUS, config.COL_OFFER_EXPIRY,
+    config.COL_OFFER_REQUESTER, config.COL_OFFER_CHANGES_JSON, config.COL_OFFER_EMAIL_STATUS,
+    config.COL_OFFER_EMAIL_LATENCY,
+]
+
+
+def generate_tables(num_employees, num_shifts, requests_per_employee=0.5, today=DEFAULT_TODAY, seed=0):
+    """
+    Returns {tab: rows (header first)} for a synthetic month. Employees and
+    shifts are spread evenly over ROLES, the official schedule rotates every
+    role's employees over its shifts, and requests are 1-4 day absences that
+    start after `today` and overlap heavily.
+    """
+    rng = random.Random(seed)
+    _, num_days = calendar.monthrange(today.year, today.month)
+    day_labels = [f"{d:02d}/{today.month:02d}" for d in range(1, num_days + 1)]
+
+    employees = [[config.COL_EMPLOYEE_NAME, config.COL_EMPLOYEE_EMAIL, config.COL_EMPLOYEE_ROLE, config.COL_EMPLOYEE_TOKENS]]
+    employees_by_role = {role: [] for role in ROLES}
+    for i in range(num_employees):
+        role = ROLES[i % len(ROLES)]
+        name = f"E{i:04d}"
+        employees_by_role[role].append(name)
+        employees.append([name, f"{name.lower()}@example.com", role, rng.randint(20, 100)])
+
+    shifts = [[config.COL_SHIFT_ID, config.COL_SHIFT_DURATION, config.COL_SHIFT_ROLE, config.COL_SHIFT_DAYS]]
+    shifts_by_role = {role: [] for role in ROLES}
+    for i in range(num_shifts):
+        role = ROLES[i % len(ROLES)]
+        shift_id = f"S{i:03d}"
+        # Mostly daily shifts, with some weekday-only ones ('6' avoids a leading 0 being numericised away)
+        applicable_days = '6543210' if i % 4 else '43210'
+        shifts_by_role[role].append((shift_id, applicable_days))
+        shifts.append([shift_id, rng.choice([8, 10, 12]), role, applicable_days])
+
+    official = [[config.COL_SCHEDULE_SHIFT] + day_labels]
+    rows = {}
+    for role, role_shifts in shifts_by_role.items():
+        staff = employees_by_role[role]
+        for j, (shift_id, applicable_days) in enumerate(role_shifts):
+            rows[shift_id] = [
+                staff[(d * len(role_shifts) + j) % len(staff)] if staff and str(d % 7) in applicable_days else ''
+                for d in range(num_days)
+            ]
+    for shift_id, _ in sorted((s for role_shifts in shifts_by_role.values() for s in role_shifts)):
+        official.append([shift_id] + rows[shift_id])
+
+    requests = [[config.COL_REQUEST_NAME, config.COL_REQUEST_START, config.COL_REQUEST_END, config.COL_REQUEST_TOKENS]]
+    first_day = min(today.day + 1, num_days)
+    for _ in range(int(num_employees * requests_per_employee)):
+        name = employees[rng.randint(1, num_employees)][0]
+        start_day = rng.randint(first_day, num_days)
+        end_day = min(num_days, start_day + rng.randint(0, 3))
+        start, end = today.replace(day=start_day), today.replace(day=end_day)
+        requests.append([name, start.strftime('%d/%m/%Y'), end.strftime('%d/%m/%Y'), rng.randint(1, 20)])
+
+    return {
+        config.EMPLOYEES_TAB: employees,
+        config.SHIFTS_TAB: shifts,
+        config.REQUESTS_TAB: requests,
+        config.OFFICIAL_SCHEDULE_TAB: official,
+        config.SANDBOX_SCHEDULE_TAB: [[config.COL_SCHEDULE_SHIFT] + day_labels],
+        config.OFFERS_TAB: [OFFERS_HEADER],
+        config.METADATA_TAB: [['']],
+    }
+
+
+class NullSmtpPool:
+    """Accepts every message without sending it, so offers run end to end offline."""
+    size = config.SMTP_POOL_SIZE
+
+    def send(self, msg):
+        pass
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def quiet(verbose):
+    """Silences the pipeline's progress output unless `verbose`."""
+    if verbose:
+        yield
+    else:
+        with redirect_stdout(io.StringIO()):
+            yield
+
+
+def run_pipeline(tables, today, seed=0, verbose=False):
+    """
+    Runs every phase once against a fresh in-memory copy of `tables`.
+    Returns ({phase: seconds}, stats).
+    """
+    rng = random.Random(seed)
+    # Offers are only built when credentials are set; NullSmtpPool never uses them.
+    os.environ.setdefault('GMAIL_ADDRESS', 'bench@example.com')
+    os.environ.setdefault('GMAIL_APP_PASSWORD', 'unused')
+    storage = LocalStorage()
+    for tab, values in tables.items():
+        storage.load_tab(tab, values)
+    timings = {}
+    stats = {}
+
+    @contextmanager
+    def timed(phase):
+        started = time.perf_counter()
+        with quiet(verbose):
+            yield
+        timings[phase] = time.perf_counter() - started
+
+    with timed('load'):
+        scheduler = Scheduler(storage=storage, today=today)
+        scheduler._mailer = Mailer(os.environ['GMAIL_ADDRESS'], None, pool=NullSmtpPool())
+    with timed('build'):
+        model, works = ScheduleModelBuilder(**scheduler.build_problem()).build()
+    stats['variables'] = len(works)
+    with timed('solve'):
+        schedule = scheduler.generate_schedule()
+    if schedule is None:
+        raise RuntimeError("The solver found no schedule for the synthetic instance.")
+    with timed('diff'):
+        all_offers, free_moves = diff_schedules(scheduler.official_schedule, schedule)
+    stats['offers'] = len(all_offers)
+    stats['changed_cells'] = len(schedule.changes_from(scheduler.official_schedule))
+    with timed('offers'), scheduler.writes.transaction():
+        scheduler.create_and_send_offers(schedule)
+
+    # Every offer gets a reply: mostly accepted, some declined, a few left pending.
+    status_col = scheduler.writes.column(config.OFFERS_TAB, config.COL_OFFER_STATUS)
+    num_offer_rows = len(storage.fetch_tab(config.OFFERS_TAB))
+    replies = [(row, status_col, rng.choice(['ACCEPTED'] * 6 + ['DECLINED'] * 3 + ['PENDING'])) for row in range(2, num_offer_rows + 1)]
+    storage.update_cells(config.OFFERS_TAB, replies)
+
+    with timed('finalize'):
+        scheduler = Scheduler(storage=storage, today=today)
+        with scheduler.writes.transaction():
+            final_schedule = scheduler.finalize_schedule(scheduler.sandbox_schedule)
+    with timed('redistribute'), scheduler.writes.transaction():
+        scheduler.redistribute_tokens(final_schedule)
+    return timings, stats
+
+
+def compare(timings, baseline, threshold):
+    """Phases slower than (1 + threshold) x baseline, as [(phase, seconds, baseline_seconds)]."""
+    regressions = []
+    for phase, seconds in timings.items():
+        reference = baseline.get(phase)
+        if reference is None or seconds < config.BENCHMARK_MIN_SECONDS:
+            continue
+        if seconds > reference * (1 + threshold):
+            regressions.append((phase, seconds, reference))
+    return regressions
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return {'baseline': None, 'runs': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _flag_value(argv, name, default):
+    if name not in argv:
+        return default
+    try:
+        return argv[argv.index(name) + 1]
+    except IndexError:
+        print(f"Error: {name} flag must be followed by a value.")
+        sys.exit(2)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    scale = _flag_value(argv, '--scale', 'small')
+    if scale not in SCALES:
+        print(f"Error: unknown scale '{scale}'. Choose one of {', '.join(SCALES)}.")
+        return 2
+    repeat = int(_flag_value(argv, '--repeat', 1))
+    threshold = float(_flag_value(argv, '--threshold', config.BENCHMARK_REGRESSION_THRESHOLD))
+    today = datetime.strptime(_flag_value(argv, '--today', DEFAULT_TODAY.isoformat()), '%Y-%m-%d')
+    config.SOLVER_TIME_LIMIT_SECONDS = int(_flag_value(argv, '--time-limit', config.BENCHMARK_SOLVER_TIME_LIMIT_SECONDS))
+    verbose = '--verbose' in argv
+
+    print(f"--- Benchmark '{scale}' ({SCALES[scale]}), today {today:%Y-%m-%d}, best of {repeat} ---")
+    tables = generate_tables(today=today.date(), **SCALES[scale])
+    timings, stats = {}, {}
+    for _ in range(repeat):
+        run_timings, stats = run_pipeline(tables, today, verbose=verbose)
+        for phase, seconds in run_timings.items():
+            timings[phase] = min(seconds, timings.get(phase, seconds))
+
+    results_path = os.path.join(config.BENCHMARK_DIR, f"{scale}.json")
+    results = load_results(results_path)
+    baseline = (results.get('baseline') or {}).get('phases', {})
+    regressions = compare(timings, baseline, threshold)
+
+    for phase in PHASES:
+        reference = baseline.get(phase)
+        delta = f" ({timings[phase] / reference - 1:+.0%} vs baseline)" if reference else ""
+        print(f"{phase:>12}: {timings[phase] * 1000:9.1f} ms{delta}")
+    print(f"Stats: {stats}")
+
+    run = dict(
+        recorded_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        today=today.strftime('%Y-%m-%d'),
+        solver_time_limit=config.SOLVER_TIME_LIMIT_SECONDS,
+        phases=timings,
+        stats=stats,
+    )
+    results['runs'] = (results.get('runs') or [])[-(config.BENCHMARK_HISTORY_SIZE - 1):] + [run]
+    if '--update-baseline' in argv or not baseline:
+        results['baseline'] = run
+        print(f"✅ Saved this run as the '{scale}' baseline.")
+    save_results(results_path, results)
+
+    if regressions:
+        for phase, seconds, reference in regressions:
+            print(f"❌ Regression in '{phase}': {seconds * 1000:.1f} ms vs {reference * 1000:.1f} ms baseline (threshold {threshold:.0%}).")
+        return 1
+    print("✅ No regression beyond the threshold.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
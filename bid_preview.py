@@ -0,0 +1,196 @@
+"""
+What-if evaluation of hypothetical absence requests.
+
+One preview model is built per role: the regular model (existing requests,
+stability bonus and hint) plus an unrewarded "off on day d" indicator for
+every day of every hypothetical request. The model is serialized once and
+parsed by each worker process at start-up; a scenario is then a single short
+solve with its indicators passed as assumptions, warm-started from one
+baseline solve without any. The objective lost by forcing the days off is
+what the request has to outbid.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import zlib
+from ortools.sat.python import cp_model
+import config
+from model_builder import ScheduleModelBuilder, expand_pools
+from schedule_solver import split_by_role
+
+_worker_models = {}  # {role: (model, works, fixed_assignments)}, set up once per worker process
+
+
+def _serialize_model(model):
+    proto = model.Proto()
+    if hasattr(proto, 'SerializeToString'):  # Protobuf-backed models (older OR-Tools releases)
+        return proto.SerializeToString()
+    # Newer releases only parse the text format back; it compresses well
+    return zlib.compress(str(proto).encode(), 1)
+
+
+def _parse_model(data):
+    """A CpModel from `_serialize_model` output. Raises ValueError if it cannot be parsed."""
+    model = cp_model.CpModel()
+    proto = model.Proto()
+    try:
+        if hasattr(proto, 'ParseFromString'):
+            proto.ParseFromString(data)
+            return model
+        if proto.parse_text_format(zlib.decompress(data).decode()):
+            return model
+    except Exception as e:
+        raise ValueError(f"Invalid preview model: {e}")
+    raise ValueError("Invalid preview model")
+
+
+def _init_worker(payload):
+    for role, (data, works_keys, fixed_assignments) in payload.items():
+        model = _parse_model(data)
+        works = {key: model.GetBoolVarFromProtoIndex(index) for key, index in works_keys}
+        _worker_models[role] = (model, works, fixed_assignments)
+
+
+def _solve_scenario(role, assumption_indexes, time_limit, hint=None):
+    """
+    Solves the preview model of `role` with the given indicators assumed true,
+    starting from `hint` (one 0/1 value per works variable) when given.
+    Returns (status_name, objective, values, core): values are the works
+    variables' 0/1 values, and core lists the assumed indicators that cannot
+    all hold together when the scenario is infeasible.
+    """
+    model, works, _ = _worker_models[role]
+    model.ClearAssumptions()
+    model.AddAssumptions([model.GetBoolVarFromProtoIndex(index) for index in assumption_indexes])
+    if hint is not None:
+        model.ClearHints()
+        proto_hint = model.Proto().solution_hint
+        proto_hint.vars.extend(var.Index() for var in works.values())
+        proto_hint.values.extend(hint)
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = 1  # The scenarios themselves run in parallel
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.cp_model_probing_level = 0  # Probing costs more than it saves on a short solve
+    status = solver.Solve(model)
+    if status == cp_model.INFEASIBLE:
+        return solver.StatusName(status), None, None, list(solver.SufficientAssumptionsForInfeasibility())
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return solver.StatusName(status), None, None, []
+    return solver.StatusName(status), solver.ObjectiveValue(), [int(solver.BooleanValue(var)) for var in works.values()], []
+
+
+def _assignments(builder, values):
+    """{(shift_id, day): employee} of a solution given as works values."""
+    assignments = dict(builder.fixed_assignments)
+    for (e, s, d), value in zip(builder.works, values):
+        if value:
+            assignments[(s, d)] = e
+    return expand_pools(assignments, builder.pools)
+
+
+def _offer_recipients(official, assignments):
+    """Employees offered a change of `assignments` from the official schedule, as in diff_schedules."""
+    recipients = set()
+    for key, official_employee in official.items():
+        employee = assignments.get(key)
+        if official_employee and employee != official_employee:
+            recipients.update(e for e in (official_employee, employee) if e)
+    return recipients
+
+
+def preview_requests(problem, scenarios, time_limit=None, max_workers=None):
+    """
+    Evaluates hypothetical requests against `problem` (ScheduleModelBuilder
+    arguments). Each scenario is a dict with 'employee', 'tokens_bid',
+    'num_days' (the request's length, over which the bid is spread) and
+    'days' (its horizon day indexes). Returns one result dict per scenario,
+    with status ('granted', 'outbid', 'blocked', 'unknown' when the solves ran
+    out of time, 'outside_horizon' or 'unknown_employee'), granted, min_bid
+    (None when no bid can win or it could not be worked out), offers and
+    blocked_days (the horizon days that cannot be freed).
+    """
+    time_limit = time_limit or config.PREVIEW_TIME_LIMIT_SECONDS
+    components = split_by_role(problem)
+    employee_roles = problem['employee_roles']
+
+    plans = []  # (scenario, role, indicator indexes, their days, blocked days)
+    builders = {}
+    for scenario in scenarios:
+        role = employee_roles.get(scenario['employee'])
+        if role is None or not scenario['days']:
+            plans.append((scenario, role, [], [], []))
+            continue
+        if role not in builders:
+            # Zero-bid requests keep the previewed employees out of the counted pools,
+            # where they would have no variables of their own
+            markers = [(s['employee'], 1, 'OFF', 0) for s in scenarios if employee_roles.get(s['employee']) == role]
+            builders[role] = ScheduleModelBuilder(**dict(components[role], requests=components[role]['requests'] + markers))
+            builders[role].build()
+        builder = builders[role]
+        indicators, indicator_days, blocked = [], [], []
+        for d in scenario['days']:
+            indicator = builder.add_off_indicator(scenario['employee'], d)
+            if indicator is not None:
+                indicators.append(indicator.Index())
+                indicator_days.append(d)
+            elif d in builder.fixed_days_by_employee.get(scenario['employee'], ()):
+                blocked.append(d)  # A locked working day
+        plans.append((scenario, role, indicators, indicator_days, blocked))
+
+    payload = {
+        role: (_serialize_model(builder.model), [(key, var.Index()) for key, var in builder.works.items()], builder.fixed_assignments)
+        for role, builder in builders.items()
+    }
+    results = []
+    # Each solve is wall-clock limited, so never more workers than cores
+    max_workers = max_workers or min(config.NUM_PARALLEL_WORKERS, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(payload,)) as pool:
+        # The baseline of each role first: the scenarios start from its solution
+        baseline_futures = {role: pool.submit(_solve_scenario, role, [], config.PREVIEW_BASELINE_TIME_LIMIT_SECONDS) for role in payload}
+        baselines = {role: future.result() for role, future in baseline_futures.items()}
+        futures = [
+            pool.submit(_solve_scenario, role, indicators, time_limit, baselines[role][2])
+            if scenario['days'] and role in payload and not blocked and baselines[role][1] is not None else None
+            for scenario, role, indicators, _, blocked in plans
+        ]
+
+        for (scenario, role, indicators, indicator_days, blocked), future in zip(plans, futures):
+            result = dict(scenario, status='blocked', granted=False, min_bid=None, offers=0, blocked_days=blocked)
+            results.append(result)
+            if role is None:
+                result['status'] = 'unknown_employee'
+                continue
+            if not scenario['days']:
+                result['status'] = 'outside_horizon'
+                continue
+            if blocked:
+                continue
+            baseline_status, baseline_objective, baseline_values, _ = baselines[role]
+            if future is None:
+                result['status'] = 'unknown'  # No baseline schedule within its time limit
+                print(f"⚠️ No baseline schedule for role {role} ({baseline_status}).")
+                continue
+            status, objective, values, core = future.result()
+            if status == 'INFEASIBLE':
+                core_days = dict(zip(indicators, indicator_days))
+                result['blocked_days'] = sorted(core_days[index] for index in core if index in core_days) or indicator_days
+                continue
+            if objective is None:
+                result['status'] = 'unknown'  # Neither a schedule nor a proof of infeasibility in time
+                continue
+            # Objective lost by forcing the days off: the daily bid, over the rewarded days, must beat it.
+            # A scenario stopped before optimality overestimates it, so the min bid errs on the high side.
+            loss = max(0, round(baseline_objective - objective))
+            if indicators:
+                result['min_bid'] = (loss // len(indicators) + 1) * scenario['num_days']
+                result['granted'] = scenario['tokens_bid'] // scenario['num_days'] * len(indicators) > loss
+            else:
+                result['min_bid'] = 0  # Days the employee cannot work anyway
+                result['granted'] = True
+            result['status'] = 'granted' if result['granted'] else 'outbid'
+            # Colleagues the request adds to the offer round of the baseline schedule
+            builder = builders[role]
+            recipients = _offer_recipients(builder.official_assignments, _assignments(builder, values))
+            recipients -= _offer_recipients(builder.official_assignments, _assignments(builder, baseline_values))
+            recipients.discard(scenario['employee'])
+            result['offers'] = len(recipients)
+    return results
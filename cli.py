@@ -0,0 +1,92 @@
+"""
+Single entry point of the scheduler's jobs.
+
+Usage: python cli.py send-offers [--group G1,G2] [--local FILE] [--dry-run] [--from-incumbent] [--repair]
+       python cli.py process-replies [--local FILE] [--dry-run]
+       python cli.py preview [--local FILE] NAME,START,END,TOKENS [...]
+       python cli.py bench [benchmark.py flags]
+       python cli.py bench --startup [--repeat N]
+
+Only the standard library is loaded until the subcommand is known. Each
+subcommand then imports the script it runs, and Scheduler imports the solver
+(ortools), IMAP and SMTP modules in the methods that use them, so e.g. the
+hourly reply processing never loads ortools.
+
+`bench --startup` starts every subcommand in fresh interpreters, up to the
+point where it would run, and fails when one takes longer than its
+config.CLI_STARTUP_BUDGET_SECONDS or has loaded one of its
+config.CLI_DEFERRED_MODULES.
+"""
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+import config
+
+# Script run by each subcommand, through its main(argv)
+COMMANDS = {
+    'send-offers': 'send_offers',
+    'process-replies': 'process_replies',
+    'preview': 'preview',
+    'bench': 'benchmark',
+}
+
+
+def load(command):
+    """Imports the script of `command` without running it."""
+    return importlib.import_module(COMMANDS[command])
+
+
+def measure_startup(command, repeat=3):
+    """
+    Best wall time of `repeat` fresh interpreters loading `command`, and the
+    modules of config.CLI_DEFERRED_MODULES it loaded. Returns (seconds, [module]).
+    """
+    deferred = config.CLI_DEFERRED_MODULES.get(command, [])
+    code = f"import cli, json, sys; cli.load({command!r}); print(json.dumps([m for m in {deferred!r} if m in sys.modules]))"
+    best, loaded = None, []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        seconds = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"'{command}' failed to start: {result.stderr.strip()}")
+        best = seconds if best is None else min(best, seconds)
+        loaded = json.loads(result.stdout.splitlines()[-1])
+    return best, loaded
+
+
+def check_startup(argv):
+    """Measures every subcommand's startup against its budget. Returns the exit code."""
+    repeat = int(argv[argv.index('--repeat') + 1]) if '--repeat' in argv else 3
+    failed = False
+    for command in COMMANDS:
+        seconds, loaded = measure_startup(command, repeat)
+        budget = config.CLI_STARTUP_BUDGET_SECONDS[command]
+        print(f"{command:>16}: {seconds * 1000:7.1f} ms (budget {budget * 1000:.0f} ms)")
+        if seconds > budget:
+            print(f"❌ '{command}' took {seconds * 1000:.1f} ms to start, over its {budget * 1000:.0f} ms budget.")
+            failed = True
+        if loaded:
+            print(f"❌ '{command}' loaded {', '.join(loaded)} at startup.")
+            failed = True
+    if not failed:
+        print("✅ Every subcommand starts within its budget.")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(__doc__.strip())
+        return 2
+    command, args = argv[0], argv[1:]
+    if command == 'bench' and '--startup' in args:
+        return check_startup(args)
+    return load(command).main(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+EMPTY = -1  # Employee id of an unassigned cell
+
+
+class ScheduleAxes:
+    """
+    Interns shifts, days and employees to integer ids.
+
+    Schedules built on the same axes can be compared and combined as plain
+    integer arrays. Employees are interned on first sight, so names that are
+    not on the roster (e.g. in an old official schedule) still get an id.
+    """
+
+    def __init__(self, shift_ids, day_labels, employees=(), dates=None):
+        self.shift_ids = list(shift_ids)
+        self.day_labels = list(day_labels)
+        self.shift_index = {shift_id: i for i, shift_id in enumerate(self.shift_ids)}
+        self.day_index = {day: i for i, day in enumerate(self.day_labels)}
+        # Real date of each day label, when the days are keyed by date
+        self.dates = list(dates) if dates is not None else None
+        self.date_index = {day: i for i, day in enumerate(self.dates)} if dates is not None else {}
+        self.employees = []
+        self.employee_index = {}
+        for employee in employees:
+            self.employee_id(employee)
+
+    def employee_id(self, name):
+        """Id of an employee, interning new names. Empty cells map to EMPTY."""
+        if name is None or name == '' or pd.isna(name):
+            return EMPTY
+        if name not in self.employee_index:
+            self.employee_index[name] = len(self.employees)
+            self.employees.append(name)
+        return self.employee_index[name]
+
+    def names(self, ids):
+        """Maps an array of employee ids back to names ('' for EMPTY)."""
+        lookup = np.array(self.employees + [''], dtype=object)
+        return lookup[np.asarray(ids)]
+
+
+class CompactSchedule:
+    """
+    A schedule stored as a dense (shifts x days) int32 array of employee ids.
+
+    This is the one schedule representation used across the pipeline: the
+    solver output, the official schedule, the sandbox and the finalized
+    sandbox are all CompactSchedules on the same ScheduleAxes.
+    """
+
+    def __init__(self, axes, assignments=None):
+        self.axes = axes
+        if assignments is None:
+            assignments = np.full((len(axes.shift_ids), len(axes.day_labels)), EMPTY, dtype=np.int32)
+        self.assignments = assignments
+
+    @classmethod
+    def from_solution(cls, axes, solution):
+        """From a solver solution {(shift_id, day_index): employee}. Unknown shifts and days are dropped."""
+        schedule = cls(axes)
+        for (shift_id, d), employee in solution.items():
+            s = axes.shift_index.get(shift_id)
+            if s is not None and 0 <= d < len(axes.day_labels):
+                schedule.assignments[s, d] = axes.employee_id(employee)
+        return schedule
+
+    @classmethod
+    def from_frame(cls, axes, schedule_df):
+        """From a DataFrame indexed by shift with one column per day label."""
+        schedule = cls(axes)
+        if schedule_df.empty:
+            return schedule
+        aligned = schedule_df.reindex(index=axes.shift_ids, columns=axes.day_labels)
+        values = aligned.to_numpy(dtype=object)
+        intern = np.frompyfunc(axes.employee_id, 1, 1)
+        schedule.assignments = intern(values).astype(np.int32)
+        return schedule
+
+    def copy(self):
+        return CompactSchedule(self.axes, self.assignments.copy())
+
+    def __len__(self):
+        """Number of assigned cells."""
+        return int(np.count_nonzero(self.assignments != EMPTY))
+
+    def assign(self, shift_id, day_label, employee):
+        s = self.axes.shift_index.get(shift_id)
+        d = self.axes.day_index.get(day_label)
+        if s is None or d is None:
+            raise KeyError((shift_id, day_label))
+        self.assignments[s, d] = self.axes.employee_id(employee)
+
+    def fill_outside(self, other, shift_ids, day_indexes):
+        """
+        Copies every cell of `other` (a schedule on the same axes) that lies
+        outside the block of `shift_ids` x `day_indexes`.
+        """
+        outside = np.ones(self.assignments.shape, dtype=bool)
+        rows = [self.axes.shift_index[shift_id] for shift_id in shift_ids if shift_id in self.axes.shift_index]
+        outside[np.ix_(rows, list(day_indexes))] = False
+        self.assignments[outside] = other.assignments[outside]
+
+    def diff(self, other):
+        """(shift_indexes, day_indexes) of the cells that differ, ordered by day then shift."""
+        days, shifts = np.nonzero((self.assignments != other.assignments).T)
+        return shifts, days
+
+    def changes_from(self, base):
+        """Change dicts {'day', 'shift', 'from', 'to'} turning `base` into this schedule."""
+        shifts, days = self.diff(base)
+        from_names = self.axes.names(base.assignments[shifts, days])
+        to_names = self.axes.names(self.assignments[shifts, days])
+        return [
+            {'day': self.axes.day_labels[d], 'shift': self.axes.shift_ids[s], 'from': from_name, 'to': to_name}
+            for s, d, from_name, to_name in zip(shifts, days, from_names, to_names)
+        ]
+
+    def revert(self, changes):
+        """Sets every changed cell back to its 'from' employee."""
+        for change in changes:
+            self.assign(change['shift'], change['day'], change['from'])
+
+    def working_days(self):
+        """Boolean (employees x days) matrix: is employee e working on day d."""
+        working = np.zeros((len(self.axes.employees), len(self.axes.day_labels)), dtype=bool)
+        shifts, days = np.nonzero(self.assignments != EMPTY)
+        working[self.assignments[shifts, days], days] = True
+        return working
+
+    def to_solution(self):
+        """Back to the solver shape {(shift_id, day_index): employee}."""
+        shifts, days = np.nonzero(self.assignments != EMPTY)
+        names = self.axes.names(self.assignments[shifts, days])
+        return {(self.axes.shift_ids[s], int(d)): name for s, d, name in zip(shifts, days, names)}
+
+    def to_values(self, shift_header):
+        """Sheet rows, header first."""
+        names = self.axes.names(self.assignments).tolist()
+        return [[shift_header] + self.axes.day_labels] + [
+            [shift_id] + row for shift_id, row in zip(self.axes.shift_ids, names)
+        ]
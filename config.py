@@ -8,15 +8,51 @@ REQUESTS_TAB = 'Absence_Requests'
 OFFICIAL_SCHEDULE_TAB = 'Official_Schedule'
 SANDBOX_SCHEDULE_TAB = 'Sandbox_Schedule'
 OFFERS_TAB = 'Offers'
+TOKEN_TRANSFERS_TAB = 'Token_Transfers' # Append-only journal of the token transfers (may start empty)
 METADATA_TAB = 'Metadata'
 METADATA_CELL_REQUESTERS = 'A1'
+METADATA_CELL_IMAP_WATERMARK = 'B1' # 'UIDVALIDITY:UID' of the last processed reply
+
+# Local snapshot of all the tabs above, keyed by the sheet's last modification time.
+# The Offers tab is loaded incrementally by OffersLedger instead (cached in the same directory).
+SNAPSHOT_TABS = [EMPLOYEES_TAB, SHIFTS_TAB, REQUESTS_TAB, OFFICIAL_SCHEDULE_TAB, SANDBOX_SCHEDULE_TAB, TOKEN_TRANSFERS_TAB, METADATA_TAB]
+SNAPSHOT_DIR = '.snapshots'
+ROLLBACK_ON_FAILURE = False # Drop (instead of flushing) the queued sheet writes of a run that fails partway
+TRACE_DIR = 'traces' # One JSON trace (spans, counters, solver statistics) per run
 
 # Email settings
 HR_EMAIL = 'hr.scheduler@example.com' # The address for sending/receiving offers
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 465
+SMTP_USE_SSL = True # Set to False for a local stand-in such as aiosmtpd
+SMTP_POOL_SIZE = 4 # Authenticated sessions kept open, and concurrent senders
+SMTP_TIMEOUT_SECONDS = 30
+IMAP_HOST = 'imap.gmail.com'
+IMAP_PORT = 993
+IMAP_USE_SSL = True
+REPLY_DAEMON_IDLE_SECONDS = 29 * 60 # Re-issue IDLE before servers drop it (RFC 2177)
+REPLY_DAEMON_RESCAN_SECONDS = 300 # Re-read the Offers tab for new offers and their deadlines
+REPLY_DAEMON_BACKOFF_SECONDS = 1 # First reconnect delay, doubled after each failure
+REPLY_DAEMON_MAX_BACKOFF_SECONDS = 300
 
 # Solver settings
 NUM_PARALLEL_WORKERS = 4
+PREVIEW_TIME_LIMIT_SECONDS = 0.5 # Per scenario of a bid preview (see bid_preview.py)
+PREVIEW_BASELINE_TIME_LIMIT_SECONDS = 5 # The preview's solve without any hypothetical request, per role
 SOLVER_TIME_LIMIT_SECONDS = 180 # 3 minutes
+SOLVER_RELATIVE_GAP_LIMIT = 0.0 # Stop once (bound - objective) / objective falls below this
+SOLVER_NO_IMPROVEMENT_SECONDS = 30 # Stop when no better solution was found for this long
+INCUMBENT_DIR = 'incumbents' # Best solution found so far, persisted while solving
+PLANNING_HORIZON_WEEKS = 0 # Plan a rolling horizon of this many weeks (keyed by date, Applicable_Days as weekdays with 0 = Monday); 0 plans the current month
+DAY_LABEL_FORMAT = '%d/%m' # Header of the schedule columns added by a rolling horizon
+SOLVE_BY_ROLE = True # Solve each role as an independent model in a process pool
+SOLVER_TIME_LIMIT_BY_ROLE = {} # Optional per-role time budget, e.g. {'Intérimaire': 30}
+REST_RULE_EXEMPT_EMPLOYEES = ['INT1'] # Not bound by the 6-days-in-7 rule
+STRENGTHEN_MODEL = True # Model interchangeable employees as counted pools and add redundant daily demand constraints
+REPAIR_MARGIN_DAYS = 3 # A repair (send_offers.py --repair) frees this many days around each unfulfilled request
+REPAIR_MAX_COLLEAGUES = 4 # ... for the requester and at most this many employees of their role
+REPAIR_MAX_WIDENINGS = 2 # Doubles the neighbourhood this many times when a repair finds no schedule, then solves in full
+REPAIR_TIME_LIMIT_SECONDS = 30
 
 # --- Column Name Mappings ---
 # This helps if the column names in the Google Sheet change.
@@ -32,6 +68,7 @@ COL_EMPLOYEE_NAME = 'Employee_Name'
 COL_EMPLOYEE_EMAIL = 'Email'
 COL_EMPLOYEE_ROLE = 'Role'
 COL_EMPLOYEE_TOKENS = 'Tokens_Official'
+EMPLOYEE_TOKEN_COLUMNS = (4, 6) # Columns the token balances are written to
 
 # Shifts sheet
 COL_SHIFT_ID = 'Shift_ID'
@@ -49,3 +86,26 @@ COL_OFFER_STATUS = 'Status'
 COL_OFFER_EXPIRY = 'Expiry_Time'
 COL_OFFER_REQUESTER = 'Requester_Name'
 COL_OFFER_CHANGES_JSON = 'Changes_JSON'
+COL_OFFER_EMAIL_STATUS = 'Email_Status' # 'SENT' or 'FAILED: <error>'
+COL_OFFER_EMAIL_LATENCY = 'Email_Latency_Ms'
+
+# Token_Transfers sheet
+COL_TRANSFER_OFFER_ID = 'Offer_ID' # The accepted offer that earned the tokens; one transfer per offer
+COL_TRANSFER_FROM = 'From_Employee'
+COL_TRANSFER_TO = 'To_Employee'
+COL_TRANSFER_TOKENS = 'Tokens'
+COL_TRANSFER_TIME = 'Recorded_At'
+
+# Benchmark settings (see benchmark.py)
+BENCHMARK_DIR = 'benchmarks' # One <scale>.json file of stored results per scale
+BENCHMARK_REGRESSION_THRESHOLD = 0.25 # Fail when a phase is more than 25% slower than its baseline
+BENCHMARK_MIN_SECONDS = 0.05 # Phases faster than this are too noisy to flag
+BENCHMARK_SOLVER_TIME_LIMIT_SECONDS = 60 # The large scale needs about a minute to find a first schedule
+BENCHMARK_HISTORY_SIZE = 50 # Runs kept per results file
+# Startup budget of each cli.py subcommand, from a fresh interpreter up to the point where it runs (see `cli.py bench --startup`)
+CLI_STARTUP_BUDGET_SECONDS = {'send-offers': 1.5, 'process-replies': 1.5, 'preview': 1.5, 'bench': 3.0}
+CLI_DEFERRED_MODULES = { # Must not be loaded before the subcommand runs
+    'send-offers': ['ortools', 'imaplib'],
+    'process-replies': ['ortools'],
+    'preview': ['ortools', 'imaplib', 'smtplib'],
+}
@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta
+import calendar
+import config
+
+# Frozen days that still share a 7-day rest window with the first free day
+CONTEXT_DAYS = 6
+
+
+def parse_day_label(label, reference):
+    """
+    Date of a schedule column label: 'dd/mm/yyyy', 'yyyy-mm-dd' or 'dd/mm'.
+    A 'dd/mm' label gets the year that puts it closest to `reference`.
+    Returns None when the label is not a date.
+    """
+    text = str(label).strip()
+    for label_format in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, label_format).date()
+        except ValueError:
+            pass
+    try:
+        day, month = (int(part) for part in text.split('/'))
+    except ValueError:
+        return None
+    candidates = []
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            continue
+    return min(candidates, key=lambda candidate: abs((candidate - reference).days)) if candidates else None
+
+
+def day_label(day):
+    return day.strftime(config.DAY_LABEL_FORMAT)
+
+
+class PlanningHorizon:
+    """
+    The days of one planning problem, keyed by real dates.
+
+    Day d of the model is `dates[d]`. Days up to `today_index` are frozen:
+    the model only sees their assignments as constants. A month horizon
+    covers the current calendar month; a rolling horizon covers the last
+    CONTEXT_DAYS frozen days plus `weeks` weeks from tomorrow, so its model
+    size does not depend on where in the month the run happens.
+    """
+
+    def __init__(self, dates, today, rolling=False):
+        self.dates = dates
+        self.today = today
+        self.rolling = rolling
+        self.index = {day: d for d, day in enumerate(dates)}
+        self.today_index = sum(1 for day in dates if day <= today) - 1
+
+    @classmethod
+    def current_month(cls, today):
+        _, num_days = calendar.monthrange(today.year, today.month)
+        return cls([today.replace(day=day) for day in range(1, num_days + 1)], today)
+
+    @classmethod
+    def rolling_weeks(cls, today, weeks):
+        start = today - timedelta(days=CONTEXT_DAYS)
+        return cls([start + timedelta(days=d) for d in range(CONTEXT_DAYS + 1 + 7 * weeks)], today, rolling=True)
+
+    @property
+    def first_weekday(self):
+        """
+        Weekday of day 0 for Applicable_Days. Month horizons keep counting from
+        the 1st of the month; rolling horizons use real weekdays (0 = Monday).
+        """
+        return self.dates[0].weekday() if self.rolling else 0
+
+    @property
+    def free_dates(self):
+        return self.dates[self.today_index + 1:]
@@ -0,0 +1,164 @@
+from collections import Counter
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+import imaplib
+import re
+import select
+import ssl
+import config
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+NEW_MAIL_PATTERN = re.compile(rb'\* \d+ (EXISTS|RECENT)')
+
+
+def parse_watermark(value):
+    """Parses a 'UIDVALIDITY:UID' watermark. Returns (None, 0) when it is unset or malformed."""
+    try:
+        uidvalidity, uid = str(value).split(':')
+        return int(uidvalidity), int(uid)
+    except ValueError:
+        return None, 0
+
+
+def format_watermark(uidvalidity, uid):
+    return f"{uidvalidity}:{uid}"
+
+
+class ReplyInbox:
+    """
+    Reads ACCEPT-/DECLINE- replies from the HR mailbox.
+
+    Only the Subject header of candidate messages is downloaded, for all of
+    them in a single UID FETCH, and a UIDVALIDITY/UID high-water mark restricts
+    the search to messages that arrived after the previous checkpoint. IMAP
+    commands are counted per name in `commands`.
+    """
+
+    def __init__(self, username, password, host=None, port=None, use_ssl=None):
+        self.username = username
+        self.password = password
+        self.host = host or config.IMAP_HOST
+        self.port = port or config.IMAP_PORT
+        self.use_ssl = config.IMAP_USE_SSL if use_ssl is None else use_ssl
+        self.mail = None
+        self.uidvalidity = None
+        self.commands = Counter()
+        self._idle_tags = 0
+
+    def connect(self):
+        imap_class = imaplib.IMAP4_SSL if self.use_ssl else imaplib.IMAP4
+        self.mail = imap_class(self.host, self.port)
+        self.mail.login(self.username, self.password)
+        self.mail.select("inbox")
+        self.commands.update(['login', 'select'])
+        _, data = self.mail.response('UIDVALIDITY')
+        self.uidvalidity = int(data[0]) if data and data[0] else None
+        return self
+
+    def search_reply_uids(self, last_uid=0):
+        """UIDs of unseen ACCEPT-/DECLINE- messages above `last_uid`, in one SEARCH."""
+        criteria = '(UNSEEN OR SUBJECT "ACCEPT-" SUBJECT "DECLINE-")'
+        if last_uid:
+            criteria = f'(UID {last_uid + 1}:* {criteria[1:-1]})'
+        _, data = self.mail.uid('SEARCH', None, criteria)
+        self.commands['uid_search'] += 1
+        # 'n:*' always matches the highest UID, even when it is below n.
+        return [uid for uid in (int(u) for u in data[0].split()) if uid > last_uid]
+
+    def fetch_subjects(self, uids):
+        """Fetches only the Subject header of every UID in one FETCH. Returns [(uid, subject)]."""
+        if not uids:
+            return []
+        uid_set = ','.join(str(uid) for uid in uids)
+        _, data = self.mail.uid('FETCH', uid_set, '(UID BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
+        self.commands['uid_fetch'] += 1
+        parser = BytesHeaderParser()
+        subjects = []
+        for part in data:
+            if not isinstance(part, tuple):
+                continue
+            match = UID_PATTERN.search(part[0])
+            if not match:
+                continue
+            raw_subject = parser.parsebytes(part[1]).get('Subject', '')
+            subject = str(make_header(decode_header(raw_subject))).strip()
+            subjects.append((int(match.group(1)), subject))
+        return sorted(subjects)
+
+    def fetch_new_replies(self, watermark=None):
+        """
+        Returns ([(uid, subject)], new_watermark) for the replies that arrived
+        since `watermark`. A UIDVALIDITY change invalidates the watermark.
+        """
+        uidvalidity, last_uid = parse_watermark(watermark)
+        if uidvalidity != self.uidvalidity:
+            last_uid = 0
+        replies = self.fetch_subjects(self.search_reply_uids(last_uid))
+        high_uid = max([last_uid] + [uid for uid, _ in replies])
+        return replies, format_watermark(self.uidvalidity, high_uid)
+
+    def watermark_before(self, uid):
+        """The watermark that makes the next fetch start again at `uid`."""
+        return format_watermark(self.uidvalidity, uid - 1)
+
+    def idle(self, timeout):
+        """
+        Waits in IMAP IDLE (RFC 2177) for up to `timeout` seconds, or until the
+        server reports activity. Returns True if new messages were reported.
+        imaplib has no IDLE command, so the exchange is driven by hand.
+        """
+        self._idle_tags += 1
+        tag = b'IDLE%d' % self._idle_tags
+        self.mail.send(tag + b' IDLE\r\n')
+        line = self.mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed before IDLE")
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE not accepted: {line!r}")
+        self.commands['idle'] += 1
+
+        if not self._has_buffered_data():
+            select.select([self.mail.sock], [], [], timeout)
+        self.mail.send(b'DONE\r\n')
+
+        new_mail = False
+        while True:
+            line = self.mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if line.startswith(tag):
+                if not line[len(tag):].strip().startswith(b'OK'):
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+                return new_mail
+            new_mail = new_mail or bool(NEW_MAIL_PATTERN.match(line))
+
+    def _has_buffered_data(self):
+        """
+        Whether data was already read off the socket, into imaplib's buffered
+        file or the SSL layer, where select() cannot see it. E.g. an EXISTS
+        sent in the same packet as the IDLE continuation.
+        """
+        sock = self.mail.sock
+        if hasattr(sock, 'pending') and sock.pending():
+            return True
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(self.mail.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    def mark_seen(self, uids):
+        if uids:
+            self.mail.uid('STORE', ','.join(str(uid) for uid in uids), '+FLAGS', '\\Seen')
+            self.commands['uid_store'] += 1
+
+    def logout(self):
+        if self.mail is not None:
+            try:
+                self.mail.logout()
+            except Exception:
+                pass
+            self.mail = None
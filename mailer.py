@@ -0,0 +1,175 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import EmailMessage
+import queue
+import smtplib
+import threading
+import time
+import config
+
+# Outcome of one message: `error` is None when it was delivered.
+Delivery = namedtuple('Delivery', ['recipient', 'subject', 'ok', 'latency_ms', 'error'])
+
+
+class SmtpPool:
+    """
+    A small pool of authenticated SMTP sessions.
+
+    Sessions are opened lazily (up to `size`) and reused for every message,
+    so only the first message of each session pays the TLS handshake and the
+    AUTH round trip. A session that fails is dropped and replaced by a fresh
+    one before the message is retried once.
+    """
+
+    def __init__(self, username, password, host=None, port=None, size=None, use_ssl=None):
+        self.username = username
+        self.password = password
+        self.host = host or config.SMTP_HOST
+        self.port = port or config.SMTP_PORT
+        self.size = size or config.SMTP_POOL_SIZE
+        self.use_ssl = config.SMTP_USE_SSL if use_ssl is None else use_ssl
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        session = smtp_class(self.host, self.port, timeout=config.SMTP_TIMEOUT_SECONDS)
+        session.ehlo()
+        # Local stand-ins (e.g. aiosmtpd) usually run without TLS or AUTH.
+        if self.use_ssl or session.has_extn('auth'):
+            session.login(self.username, self.password)
+        return session
+
+    @contextmanager
+    def session(self, fresh=False):
+        """
+        Borrows a session, opening a new one if none is idle and the pool is not
+        full. With `fresh`, idle sessions are only reused when the pool is full.
+        """
+        session = self._acquire(fresh)
+        try:
+            yield session
+        except Exception:
+            self._discard(session)
+            raise
+        else:
+            self._idle.put(session)
+
+    def _acquire(self, fresh):
+        while True:
+            if not fresh:
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            # Pool is full: wait for a session to come back (or to be discarded).
+            try:
+                return self._idle.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _discard(self, session):
+        with self._lock:
+            self._opened -= 1
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def send(self, msg):
+        for attempt in (1, 2):
+            try:
+                # A retry always uses a new connection: idle ones may be just as stale.
+                with self.session(fresh=attempt == 2) as session:
+                    session.send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, OSError):
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                session.quit()
+            except Exception:
+                session.close()
+            with self._lock:
+                self._opened -= 1
+
+
+class Mailer:
+    """Sends emails through an SmtpPool, one at a time or as a concurrent batch."""
+
+    def __init__(self, sender_email, app_password, dry_run=False, pool=None):
+        self.sender_email = sender_email
+        self.dry_run = dry_run
+        self.pool = pool or SmtpPool(sender_email, app_password)
+
+    def send(self, recipient_email, subject, body):
+        """Sends one message. Returns a Delivery with its latency and error, if any."""
+        delivery = self._deliver(recipient_email, subject, body)
+        self._report(delivery)
+        return delivery
+
+    def _deliver(self, recipient_email, subject, body):
+        """Sends one message without printing anything, so it can run on a worker thread."""
+        if self.dry_run:
+            return Delivery(recipient_email, subject, True, 0, None)
+
+        msg = EmailMessage()
+        msg.set_content(body)
+        msg['Subject'] = subject
+        msg['From'] = self.sender_email
+        msg['To'] = recipient_email
+
+        started = time.monotonic()
+        try:
+            self.pool.send(msg)
+        except Exception as e:
+            return Delivery(recipient_email, subject, False, int((time.monotonic() - started) * 1000), str(e))
+        return Delivery(recipient_email, subject, True, int((time.monotonic() - started) * 1000), None)
+
+    def _report(self, delivery):
+        if self.dry_run:
+            print(f"DRY RUN: Would send email to {delivery.recipient} with subject '{delivery.subject}'.")
+        elif delivery.ok:
+            print(f"✅ Email sent successfully to {delivery.recipient} ({delivery.latency_ms} ms).")
+        else:
+            print(f"❌ Failed to send email to {delivery.recipient}: {delivery.error}")
+
+    def send_many(self, messages):
+        """
+        Sends [(recipient, subject, body)] from a bounded worker pool sized like
+        the SMTP pool. Returns the Delivery results in the same order, once they
+        have all been printed from the calling thread.
+        """
+        if not messages:
+            return []
+        if self.dry_run:
+            deliveries = [self._deliver(*message) for message in messages]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(messages), self.pool.size)) as executor:
+                deliveries = list(executor.map(lambda message: self._deliver(*message), messages))
+        for delivery in deliveries:
+            self._report(delivery)
+        return deliveries
+
+    def close(self):
+        self.pool.close()
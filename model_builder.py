@@ -0,0 +1,277 @@
+from ortools.sat.python import cp_model
+import config
+
+POOL_PREFIX = '*pool:'  # Names of the counted pools in `works`, never a valid employee name
+
+
+def expand_pools(solution, pools):
+    """
+    Hands the shifts of each pool in a {(shift_id, day): employee} solution out
+    to its members, round-robin in day order. A pool works at most as many
+    shifts a day as it has members, and at most 6 times as many in any 7
+    days, so every member gets at most one shift a day and 6 in any 7 days.
+    """
+    if not pools:
+        return solution
+    expanded = {}
+    pool_cells = {}
+    for (s_id, d), employee in solution.items():
+        if employee in pools:
+            pool_cells.setdefault(employee, []).append((d, s_id))
+        else:
+            expanded[(s_id, d)] = employee
+    for pool, cells in pool_cells.items():
+        members = pools[pool]
+        for i, (d, s_id) in enumerate(sorted(cells)):
+            expanded[(s_id, d)] = members[i % len(members)]
+    return expanded
+
+
+class ScheduleModelBuilder:
+    """
+    Builds the CP-SAT scheduling model used by Scheduler.generate_schedule.
+
+    The builder only takes plain Python structures (no DataFrames), and indexes
+    the `works` variables by employee/day and by shift/day as they are created.
+    Every constraint family is then emitted straight from those indexes, so the
+    build time grows linearly with the number of variables.
+
+    Official assignments on locked days (d <= today_index) are not modelled at
+    all: they are kept in `fixed_assignments` and only enter the constraints as
+    constants. The official assignments of the free days are given to CP-SAT as
+    a warm-start hint. With a `neighbourhood` (repair mode), the free days
+    outside of it are pinned to those assignments as well, so only the
+    neighbourhood can change.
+
+    With config.STRENGTHEN_MODEL, interchangeable employees (same role and rest
+    rule, no request, no official assignment) are modelled as one counted pool
+    instead of one row of variables each, which removes their permutations
+    from the search (see `expand_pools`), and each role's daily demand is
+    added as a redundant constraint.
+    """
+
+    def __init__(self, employee_roles, shifts, num_days, requests=None, official_assignments=None, today_index=-1, first_weekday=0, neighbourhood=None):
+        # employee_roles: {employee_name: role}
+        # shifts: {shift_id: {'duration': int, 'role': str, 'days': [int]}}
+        # requests: [(employee_name, day_number, 'OFF', tokens)], day_number = day_index + 1
+        # official_assignments: {(shift_id, day_index): employee_name}
+        # first_weekday: the 'days' entry of a shift that day 0 counts as
+        # neighbourhood: {employee_name: {day_index}} that may change, None to free every day
+        self.employee_roles = employee_roles
+        self.shifts = shifts
+        self.num_days = num_days
+        self.requests = requests or []
+        self.official_assignments = official_assignments or {}
+        self.today_index = today_index
+        self.first_weekday = first_weekday
+        self.neighbourhood = neighbourhood
+
+        self.model = cp_model.CpModel()
+        self.works = {}
+        self.employees_by_role = {}
+        self.works_by_employee_day = {}  # {employee: {day_index: [vars]}}
+        self.works_by_shift_day = {}  # {(shift_id, day_index): [vars]}
+        self.fixed_assignments = {}  # {(shift_id, day_index): employee} on locked days
+        self.fixed_days_by_employee = {}  # {employee: {day_index}}
+        self.off_indicators = {}  # {(employee, day_index): BoolVar}, one per requested day off
+        self.pools = {}  # {pool name: [employee]}, each pool modelled as a single counted employee
+        self.exempt_pools = set()  # Pools of employees exempt from the rest rule
+
+    def build(self):
+        """Creates the variables, constraints and objective. Returns (model, works)."""
+        self._index_employees()
+        self._fix_locked_days()
+        self._create_variables()
+        self._add_coverage_constraints()
+        self._add_one_shift_per_day_constraints()
+        self._add_rest_constraints()
+        if self.neighbourhood is not None:
+            self._pin_outside_neighbourhood()
+        request_bonuses = self._add_request_indicators()
+        hint_bonuses = self._collect_hint_bonuses()
+        if config.STRENGTHEN_MODEL:
+            self._add_daily_demand_constraints()
+        self.model.Maximize(sum(request_bonuses) + sum(hint_bonuses))
+        self._add_warm_start_hint()
+        return self.model, self.works
+
+    def _index_employees(self):
+        pooled = self._find_pools() if config.STRENGTHEN_MODEL else set()
+        for employee, role in self.employee_roles.items():
+            if employee not in pooled:
+                self.employees_by_role.setdefault(role, []).append(employee)
+        for pool, members in self.pools.items():
+            self.employees_by_role.setdefault(self.employee_roles[members[0]], []).append(pool)
+        for employees in self.employees_by_role.values():
+            for employee in employees:
+                self.works_by_employee_day[employee] = {}
+                self.fixed_days_by_employee[employee] = set()
+
+    def _find_pools(self):
+        """
+        Groups the employees of a role who have no request and no official
+        assignment, and the same rest rule (and repair neighbourhood): any
+        schedule stays as good when their rows are swapped. Returns the pooled
+        employees.
+        """
+        distinct = {e for e, _, _, _ in self.requests} | set(self.official_assignments.values())
+        classes = {}
+        for e, role in self.employee_roles.items():
+            if e not in distinct:
+                days = frozenset(self.neighbourhood.get(e, ())) if self.neighbourhood is not None else None
+                classes.setdefault((role, e in config.REST_RULE_EXEMPT_EMPLOYEES, days), []).append(e)
+        for (role, exempt, days), members in classes.items():
+            if len(members) < 2:
+                continue
+            pool = f"{POOL_PREFIX}{role}:{len(self.pools)}"
+            self.pools[pool] = members
+            if exempt:
+                self.exempt_pools.add(pool)
+            if days is not None:
+                self.neighbourhood = dict(self.neighbourhood, **{pool: days})
+        return {e for members in self.pools.values() for e in members}
+
+    def _is_shift_day(self, s_info, d):
+        return (self.first_weekday + d) % 7 in s_info['days']
+
+    def _fix_locked_days(self):
+        """Turns the official assignments of locked days into constants."""
+        for (s_id, d), employee in self.official_assignments.items():
+            s_info = self.shifts.get(s_id)
+            if d > self.today_index or s_info is None or not self._is_shift_day(s_info, d):
+                continue
+            if self.employee_roles.get(employee) != s_info['role']:
+                continue
+            fixed_days = self.fixed_days_by_employee[employee]
+            if d in fixed_days:
+                continue
+            self.fixed_assignments[(s_id, d)] = employee
+            fixed_days.add(d)
+
+    def _create_variables(self):
+        for s_id, s_info in self.shifts.items():
+            shift_days = [
+                d for d in range(self.num_days)
+                if self._is_shift_day(s_info, d) and (s_id, d) not in self.fixed_assignments
+            ]
+            for d in shift_days:
+                self.works_by_shift_day[(s_id, d)] = []
+            for e in self.employees_by_role.get(s_info['role'], []):
+                employee_days = self.works_by_employee_day[e]
+                fixed_days = self.fixed_days_by_employee[e]
+                for d in shift_days:
+                    if d in fixed_days:
+                        continue
+                    var = self.model.NewBoolVar(f'works_{e}_{s_id}_{d}')
+                    self.works[(e, s_id, d)] = var
+                    employee_days.setdefault(d, []).append(var)
+                    self.works_by_shift_day[(s_id, d)].append(var)
+
+    def _add_coverage_constraints(self):
+        for shift_day_vars in self.works_by_shift_day.values():
+            self.model.AddExactlyOne(shift_day_vars)
+
+    def _add_one_shift_per_day_constraints(self):
+        """One shift a day per employee, and per member of a pool."""
+        for e, employee_days in self.works_by_employee_day.items():
+            capacity = len(self.pools.get(e, [e]))
+            for day_vars in employee_days.values():
+                if len(day_vars) > capacity:
+                    if capacity == 1:
+                        self.model.AddAtMostOne(day_vars)
+                    else:
+                        self.model.Add(sum(day_vars) <= capacity)
+
+    def _add_rest_constraints(self):
+        """At most 6 worked days in any sliding window of 7 days (per member of a pool)."""
+        for e, employee_days in self.works_by_employee_day.items():
+            if e in config.REST_RULE_EXEMPT_EMPLOYEES or e in self.exempt_pools:
+                continue
+            capacity = len(self.pools.get(e, [e]))
+            fixed_days = self.fixed_days_by_employee[e]
+            for d in range(self.num_days - 6):
+                worked_days = [var for day in range(d, d + 7) for var in employee_days.get(day, [])]
+                allowed_days = max(0, 6 * capacity - sum(1 for day in range(d, d + 7) if day in fixed_days))
+                if len(worked_days) > allowed_days:
+                    self.model.Add(sum(worked_days) <= allowed_days)
+
+    def _pin_outside_neighbourhood(self):
+        """
+        Pins every variable outside of the neighbourhood to the official schedule,
+        in a single constraint. Cells without a valid official assignment stay
+        free, since pinning them would leave them uncovered.
+        """
+        official_cells = {(s_id, d) for (s_id, d), e in self.official_assignments.items() if (e, s_id, d) in self.works}
+        pinned = []
+        for (e, s_id, d), var in self.works.items():
+            if d in self.neighbourhood.get(e, ()) or (s_id, d) not in official_cells:
+                continue
+            pinned.append(var if self.official_assignments[(s_id, d)] == e else var.Not())
+        if pinned:
+            self.model.AddBoolAnd(pinned)
+
+    def _add_request_indicators(self):
+        """
+        One shared "off on day d" indicator per (employee, day), rewarded with
+        the sum of the bids of every request covering that day.
+        """
+        daily_bids = {}
+        for emp, day, shift_type, penalty in self.requests:
+            if shift_type == 'OFF':
+                daily_bids[(emp, day - 1)] = daily_bids.get((emp, day - 1), 0) + penalty
+
+        request_bonuses = []
+        for (emp, day_index), bid in daily_bids.items():
+            if bid <= 0:
+                continue
+            off_indicator = self.add_off_indicator(emp, day_index)
+            if off_indicator is not None:
+                request_bonuses.append(bid * off_indicator)
+        return request_bonuses
+
+    def add_off_indicator(self, emp, day_index):
+        """
+        The "off on day d" indicator of an employee, created on first use. None
+        on a locked working day (never fulfilled) or a day the employee cannot
+        work (always fulfilled): a constant either way.
+        """
+        if (emp, day_index) in self.off_indicators:
+            return self.off_indicators[(emp, day_index)]
+        is_working_on_day = self.works_by_employee_day.get(emp, {}).get(day_index, [])
+        if not is_working_on_day:
+            return None
+        off_indicator = self.model.NewBoolVar(f'off_{emp}_{day_index}')
+        # Maximizing only ever sets the indicator when the employee is off, so
+        # the reverse implication is not needed.
+        self.model.AddBoolAnd([var.Not() for var in is_working_on_day]).OnlyEnforceIf(off_indicator)
+        self.off_indicators[(emp, day_index)] = off_indicator
+        return off_indicator
+
+    def _collect_hint_bonuses(self):
+        hint_bonuses = []
+        for (s_id, d), employee in self.official_assignments.items():
+            if d > self.today_index and (employee, s_id, d) in self.works:
+                hint_bonuses.append(self.works[(employee, s_id, d)])
+        return hint_bonuses
+
+    def _add_daily_demand_constraints(self):
+        """
+        The shifts a role has to cover on a day, as one sum over its employees.
+        It follows from the coverage constraints, but gives the LP relaxation
+        the role's daily demand in a single row.
+        """
+        demand = {}
+        for (s_id, d), shift_day_vars in self.works_by_shift_day.items():
+            role_day = demand.setdefault((self.shifts[s_id]['role'], d), [0, []])
+            role_day[0] += 1
+            role_day[1].extend(shift_day_vars)
+        for count, day_vars in demand.values():
+            if len(day_vars) > count:
+                self.model.Add(sum(day_vars) == count)
+
+    def _add_warm_start_hint(self):
+        """Hints the official schedule of the free days as the starting solution."""
+        # Written to the proto in two bulk extends rather than one AddHint call per variable
+        hint = self.model.Proto().solution_hint
+        hint.vars.extend(var.Index() for var in self.works.values())
+        hint.values.extend(int(self.official_assignments.get((s_id, d)) == e) for e, s_id, d in self.works)
@@ -0,0 +1,195 @@
+from bisect import insort
+import json
+import os
+import config
+from sheet_snapshot import numericise
+
+# Statuses that no reply or expiry changes any more
+SETTLED_STATUSES = ('ACCEPTED', 'DECLINED', 'EXPIRED')
+# Offers whose changes are reverted when the round is finalized
+FAILED_STATUSES = ('DECLINED', 'EXPIRED', 'PENDING')
+
+
+class OffersLedger:
+    """
+    The Offers tab in memory, indexed by offer id, status and requester.
+    Nothing looks offers up by employee, so there is no index for that; the
+    employee of an offer is read from its row.
+
+    The tab only grows, and an offer never changes again once it is accepted,
+    declined or expired. The ledger therefore keeps a row watermark: the rows
+    up to it (header included) are settled, and a refresh only re-reads the
+    rows after it, which are the pending offers and the ones appended since,
+    plus the watermark row itself to check that the cache still matches the
+    sheet. The settled rows are cached on disk next to the sheet snapshot, and the
+    reply daemon keeps one ledger across its events.
+
+    `rows` is the raw tab (header first). The Scheduler shares the list with
+    the snapshot, and WriteBuffer sends the Offers writes through `set_cells`
+    so the indexes follow them.
+    """
+
+    def __init__(self, rows=None, revision=None):
+        self.rows = rows if rows is not None else []
+        self.revision = revision
+        self.cache_path = None  # Disk cache of the rows, for storage backends with a cache_key
+        self.watermark = 0
+        self._reindex()
+
+    @classmethod
+    def load(cls, storage, revision, cache_dir=None):
+        """The ledger of `storage` at `revision`, from the disk cache plus the rows after its watermark."""
+        ledger = cls()
+        if storage.cache_key is not None:
+            ledger.cache_path = os.path.join(cache_dir or config.SNAPSHOT_DIR, f"{storage.cache_key}_offers.json")
+            cached = ledger._read_cache()
+            if cached:
+                ledger.rows.extend(cached['rows'])
+                ledger.revision = cached['revision']
+                ledger._reindex()
+        ledger.refresh(storage, revision)
+        return ledger
+
+    def refresh(self, storage, revision):
+        """
+        Re-reads the rows from the watermark on if the sheet changed. Returns
+        the number of rows fetched. The watermark row is read again to check
+        that the cached rows still match the sheet; if its offer changed (rows
+        were deleted, moved or edited by hand), the whole tab is reloaded.
+        """
+        if revision == self.revision and self.rows:
+            return 0
+        first_row = max(self.watermark, 1)
+        new_rows = storage.fetch_rows(config.OFFERS_TAB, first_row)
+        if self.watermark and not self._same_row(first_row, new_rows[0] if new_rows else []):
+            print(f"⚠️ Offers row {first_row} no longer holds the cached offer. Reloading the whole tab.")
+            first_row = 1
+            new_rows = storage.fetch_rows(config.OFFERS_TAB, first_row)
+        for row_index in range(first_row, len(self.rows) + 1):
+            self._unindex(row_index)
+        del self.rows[first_row - 1:]
+        self.rows.extend(new_rows)
+        self.revision = revision
+        if first_row == 1:
+            self._reindex()
+        else:
+            for row_index in range(first_row, len(self.rows) + 1):
+                self._index(row_index)
+            self._advance_watermark()
+        print(f"Loaded {len(new_rows)} offer rows after row {first_row - 1} ({len(self.rows) - 1} offers, {self.watermark - 1} settled).")
+        self._write_cache()
+        return len(new_rows)
+
+    def _same_row(self, row_index, row):
+        """Whether a re-read row is the cached one at `row_index`: the same header, or the same offer id."""
+        if row_index == 1:
+            return list(row) == list(self.rows[0])
+        col = self._columns.get(config.COL_OFFER_ID)
+        return col is not None and col < len(row) and str(row[col]) == str(self.value(row_index, config.COL_OFFER_ID))
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self):
+        if self.cache_path is None:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'revision': self.revision, 'rows': self.rows}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _reindex(self):
+        header = self.rows[0] if self.rows else []
+        self._columns = {name: col for col, name in enumerate(header)}
+        self._by_id = {}
+        self._by_status = {}  # {status: set of rows}
+        self._by_requester = {}  # {requester: rows in sheet order}
+        for row_index in range(2, len(self.rows) + 1):
+            self._index(row_index)
+        self.watermark = min(len(self.rows), 1)
+        self._advance_watermark()
+
+    def _advance_watermark(self):
+        while self.watermark < len(self.rows) and self.value(self.watermark + 1, config.COL_OFFER_STATUS) in SETTLED_STATUSES:
+            self.watermark += 1
+
+    def _index(self, row_index):
+        offer_id = self.value(row_index, config.COL_OFFER_ID)
+        if offer_id != '':
+            self._by_id[offer_id] = row_index
+        self._by_status.setdefault(self.value(row_index, config.COL_OFFER_STATUS), set()).add(row_index)
+        insort(self._by_requester.setdefault(self.value(row_index, config.COL_OFFER_REQUESTER), []), row_index)
+
+    def _unindex(self, row_index):
+        if row_index < 2 or row_index > len(self.rows):
+            return
+        offer_id = self.value(row_index, config.COL_OFFER_ID)
+        if self._by_id.get(offer_id) == row_index:
+            del self._by_id[offer_id]
+        self._by_status.get(self.value(row_index, config.COL_OFFER_STATUS), set()).discard(row_index)
+        rows = self._by_requester.get(self.value(row_index, config.COL_OFFER_REQUESTER), [])
+        if row_index in rows:
+            rows.remove(row_index)
+
+    def set_cells(self, cells):
+        """Applies [(row, col, value)] writes to the rows and keeps the indexes in step."""
+        changed_rows = sorted({row for row, _, _ in cells})
+        for row_index in changed_rows:
+            self._unindex(row_index)
+        for row, col, value in cells:
+            self.rows.extend([] for _ in range(row - len(self.rows)))
+            current = self.rows[row - 1]
+            current.extend([''] * (col - len(current)))
+            current[col - 1] = value
+        if changed_rows and changed_rows[0] == 1:
+            self._reindex()
+            return
+        for row_index in changed_rows:
+            self._index(row_index)
+        self.watermark = min(self.watermark, changed_rows[0] - 1) if changed_rows else self.watermark
+        self._advance_watermark()
+
+    def reset(self, rows):
+        """Replaces the rows in place (e.g. after a rollback) and rebuilds the indexes."""
+        self.rows[:] = rows
+        self._reindex()
+
+    def value(self, row_index, name):
+        """Raw cell of an offer row, '' when the column or the cell is missing."""
+        col = self._columns.get(name)
+        row = self.rows[row_index - 1]
+        return row[col] if col is not None and col < len(row) else ''
+
+    def record(self, row_index):
+        """An offer row as a dict, like SheetSnapshot.records."""
+        return {name: numericise(self.value(row_index, name)) for name in self._columns}
+
+    def row(self, offer_id):
+        """Sheet row of an offer, or None if it is not in the Offers tab."""
+        return self._by_id.get(offer_id)
+
+    def status(self, offer_id):
+        row_index = self.row(offer_id)
+        return self.value(row_index, config.COL_OFFER_STATUS) if row_index else None
+
+    def rows_with_status(self, *statuses):
+        return sorted(row_index for status in statuses for row_index in self._by_status.get(status, ()))
+
+    def has_pending(self):
+        return bool(self._by_status.get('PENDING'))
+
+    def failed_offers(self):
+        """Records of the declined, expired and still pending offers, in sheet order."""
+        return [self.record(row_index) for row_index in self.rows_with_status(*FAILED_STATUSES)]
+
+    def first_accepted(self, requester):
+        """Record of the first accepted offer made for `requester`, or None."""
+        for row_index in self._by_requester.get(requester, ()):
+            if self.value(row_index, config.COL_OFFER_STATUS) == 'ACCEPTED':
+                return self.record(row_index)
+        return None
@@ -0,0 +1,44 @@
+"""
+What-if preview of absence requests against the current sheet: whether each
+one would be granted, its minimum winning bid and how many colleagues would
+get an offer. Nothing is written to the sheet and no email is sent.
+
+Usage: python preview.py [--local FILE] NAME,START,END,TOKENS [...]
+       (dates as in the Absence_Requests tab, e.g. N2,20/10/2026,22/10/2026,30)
+"""
+from scheduler_class import Scheduler
+from storage import open_local_storage
+import sys
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    storage = None
+    if '--local' in argv:
+        try:
+            storage = open_local_storage(argv[argv.index('--local') + 1])
+        except IndexError:
+            print("Error: --local flag must be followed by a .jsonl, snapshot .json or SQLite file.")
+            return 1
+        argv = argv[:argv.index('--local')] + argv[argv.index('--local') + 2:]
+
+    requests = []
+    for arg in argv:
+        fields = arg.split(',')
+        if len(fields) != 4:
+            print(f"Error: '{arg}' is not a NAME,START,END,TOKENS request.")
+            return 1
+        requests.append(dict(zip(['Employee_Name', 'Start_Date', 'End_Date', 'Tokens_Bid'], fields)))
+    if not requests:
+        print("Error: give at least one NAME,START,END,TOKENS request to preview.")
+        return 1
+
+    scheduler = Scheduler(dry_run=True, storage=storage)
+    if not scheduler.storage:
+        return 1
+    scheduler.preview_requests(requests)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
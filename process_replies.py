@@ -1,18 +1,45 @@
 from scheduler_class import Scheduler
+from storage import open_local_storage
+from tracing import Tracer
 import sys
 
 import config
 
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    storage = None
+    if '--local' in argv:
+        try:
+            storage = open_local_storage(argv[argv.index('--local') + 1])
+        except IndexError:
+            print("Error: --local flag must be followed by a .jsonl, snapshot .json or SQLite file.")
+            return 1
+
+    is_dry_run = '--dry-run' in argv
+    tracer = Tracer('process_replies')
+    scheduler = Scheduler(dry_run=is_dry_run, storage=storage, tracer=tracer)
+
+    try:
+        if scheduler.storage:
+            # All sheet writes of the run are sent in a single batch at the end
+            with scheduler.writes.transaction():
+                with tracer.span('process_replies'):
+                    accepted, declined = scheduler.process_email_replies()
+                with tracer.span('finalize'):
+                    final_sandbox = scheduler.finalize_schedule(scheduler.sandbox_schedule)
+                with tracer.span('redistribute_tokens'):
+                    scheduler.redistribute_tokens(final_sandbox)
+
+            # Read requester names from metadata sheet to add context to summary
+            requester_names = scheduler.snapshot.acell(config.METADATA_TAB, config.METADATA_CELL_REQUESTERS)
+            with tracer.span('hr_summary'):
+                scheduler.send_hr_summary(accepted, declined, requester_names)
+            scheduler.close()
+    finally:
+        scheduler.export_trace()
+    return 0
+
+
 if __name__ == '__main__':
-    is_dry_run = '--dry-run' in sys.argv
-    scheduler = Scheduler(dry_run=is_dry_run)
-
-    if scheduler.sheet:
-        accepted, declined = scheduler.process_email_replies()
-        final_sandbox_df = scheduler.finalize_schedule(scheduler.sandbox_df)
-        scheduler.redistribute_tokens(final_sandbox_df)
-
-        # Read requester names from metadata sheet to add context to summary
-        metadata_ws = scheduler.sheet.worksheet(config.METADATA_TAB)
-        requester_names = metadata_ws.acell(config.METADATA_CELL_REQUESTERS).value
-        scheduler.send_hr_summary(accepted, declined, requester_names)
+    sys.exit(main())
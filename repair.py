@@ -0,0 +1,45 @@
+import config
+
+
+def unfulfilled_requests(problem):
+    """
+    The requested days off the carried schedule does not grant yet, as
+    {employee: sorted free day indexes}. These are the new requests (and the
+    ones an earlier run could not grant), around which a repair works.
+    """
+    working = {(employee, d) for (_, d), employee in problem['official_assignments'].items()}
+    centres = {}
+    for employee, day, shift_type, tokens in problem['requests']:
+        d = day - 1
+        if shift_type == 'OFF' and tokens > 0 and d > problem['today_index'] and (employee, d) in working:
+            centres.setdefault(employee, set()).add(d)
+    return {employee: sorted(days) for employee, days in centres.items()}
+
+
+def repair_neighbourhood(problem, centres, margin_days=None, max_colleagues=None):
+    """
+    The (employee, day) pairs a repair may change, as {employee: {day indexes}}.
+
+    Around each requester, the window from `margin_days` before their first
+    unfulfilled day to `margin_days` after their last one is freed for them
+    and for up to `max_colleagues` employees of their role. Colleagues who
+    work the fewest shifts in that window come first, since they have the most
+    room to take over one. Everything else stays as in the carried schedule.
+    """
+    margin_days = config.REPAIR_MARGIN_DAYS if margin_days is None else margin_days
+    max_colleagues = config.REPAIR_MAX_COLLEAGUES if max_colleagues is None else max_colleagues
+    employee_roles = problem['employee_roles']
+    worked_days = {}
+    for (_, d), employee in problem['official_assignments'].items():
+        worked_days.setdefault(employee, set()).add(d)
+
+    neighbourhood = {}
+    for requester, days in centres.items():
+        window = set(range(max(days[0] - margin_days, problem['today_index'] + 1), min(days[-1] + margin_days + 1, problem['num_days'])))
+        colleagues = sorted(
+            (e for e, role in employee_roles.items() if role == employee_roles.get(requester) and e != requester),
+            key=lambda e: (len(worked_days.get(e, set()) & window), e),
+        )
+        for employee in [requester] + colleagues[:max_colleagues]:
+            neighbourhood.setdefault(employee, set()).update(window)
+    return neighbourhood
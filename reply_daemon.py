@@ -0,0 +1,157 @@
+"""
+Long-running reply processing over IMAP IDLE.
+
+Stays connected to the HR mailbox and records ACCEPT-/DECLINE- replies within
+seconds of their arrival, instead of waiting for the hourly process_replies.py
+run. Pending offers are expired at their deadline from an in-memory timer
+queue, and once no offer of the round is pending any more the sandbox is
+finalized, tokens are redistributed and HR gets the summary, like
+process_replies.py does. A lost connection is re-opened with exponential
+backoff, and so is any other error of an event (e.g. a Sheets API error),
+after the Offers ledger is dropped to be re-read.
+
+Usage: python reply_daemon.py [--local PATH] [--dry-run]
+For a local IMAP stand-in, set IMAP_HOST/IMAP_PORT and IMAP_USE_SSL = False
+in config.py.
+"""
+from datetime import datetime
+import heapq
+import imaplib
+import os
+import random
+import sys
+import time
+import config
+from inbox import ReplyInbox
+from scheduler_class import Scheduler
+from storage import GoogleSheetsStorage, open_local_storage
+
+
+class ReplyDaemon:
+    def __init__(self, storage, dry_run=False):
+        self.storage = storage
+        self.dry_run = dry_run
+        self.inbox = None
+        self.offers = None  # OffersLedger kept across events: each one only re-reads the open offers
+        self.deadlines = []  # Heap of (expiry datetime, offer_id) of the pending offers
+        self.last_rescan = 0
+        self.accepted = 0
+        self.declined = 0
+        self.changed_since_finalize = False
+
+    def _scheduler(self):
+        """A Scheduler on a fresh snapshot: offers may have been added since the last event."""
+        scheduler = Scheduler(dry_run=self.dry_run, storage=self.storage, offers=self.offers)
+        self.offers = scheduler.offers
+        return scheduler
+
+    def connect(self):
+        self.inbox = ReplyInbox(os.environ.get('GMAIL_ADDRESS'), os.environ.get('GMAIL_APP_PASSWORD')).connect()
+        print(f"✅ Connected to {self.inbox.host}:{self.inbox.port}. Waiting for replies...")
+
+    def disconnect(self):
+        if self.inbox is not None:
+            self.inbox.logout()
+            self.inbox = None
+
+    def rescan_offers(self):
+        """Rebuilds the timer queue from the pending offers of the Offers tab."""
+        self.deadlines = self._scheduler().pending_offer_deadlines()
+        heapq.heapify(self.deadlines)
+        self.last_rescan = time.monotonic()
+
+    def process_replies(self):
+        scheduler = self._scheduler()
+        with scheduler.writes.transaction():
+            accepted, declined = scheduler.process_email_replies(self.inbox)
+        self.accepted += accepted
+        self.declined += declined
+        if accepted or declined:
+            self.changed_since_finalize = True
+            self.rescan_offers()
+
+    def expire_due_offers(self):
+        now = datetime.now()
+        due = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            due.append(heapq.heappop(self.deadlines)[1])
+        if not due:
+            return
+        scheduler = self._scheduler()
+        with scheduler.writes.transaction():
+            if scheduler.expire_offers(due):
+                self.changed_since_finalize = True
+
+    def finalize_if_done(self):
+        """Finalizes the round once every offer has been answered or has expired."""
+        if not self.changed_since_finalize or self.deadlines:
+            return
+        scheduler = self._scheduler()
+        with scheduler.writes.transaction():
+            final_sandbox = scheduler.finalize_schedule(scheduler.sandbox_schedule)
+            scheduler.redistribute_tokens(final_sandbox)
+        requester_names = scheduler.snapshot.acell(config.METADATA_TAB, config.METADATA_CELL_REQUESTERS)
+        scheduler.send_hr_summary(self.accepted, self.declined, requester_names)
+        scheduler.close()
+        self.accepted = self.declined = 0
+        self.changed_since_finalize = False
+
+    def _idle_timeout(self):
+        """Seconds until the next deadline or offers rescan, capped by the IDLE refresh period."""
+        timeout = min(config.REPLY_DAEMON_IDLE_SECONDS, config.REPLY_DAEMON_RESCAN_SECONDS - (time.monotonic() - self.last_rescan))
+        if self.deadlines:
+            timeout = min(timeout, (self.deadlines[0][0] - datetime.now()).total_seconds())
+        return max(0.0, timeout)
+
+    def serve(self):
+        """Processes the replies already waiting, then one IDLE event at a time."""
+        self.rescan_offers()
+        self.process_replies()
+        while True:
+            if self.inbox.idle(self._idle_timeout()):
+                self.process_replies()
+            if time.monotonic() - self.last_rescan >= config.REPLY_DAEMON_RESCAN_SECONDS:
+                self.rescan_offers()
+            self.expire_due_offers()
+            self.finalize_if_done()
+
+    def run(self):
+        backoff = config.REPLY_DAEMON_BACKOFF_SECONDS
+        while True:
+            try:
+                self.connect()
+                backoff = config.REPLY_DAEMON_BACKOFF_SECONDS
+                self.serve()
+            except Exception as e:
+                delay = backoff * random.uniform(1.0, 1.5)
+                if isinstance(e, (imaplib.IMAP4.error, OSError)):
+                    print(f"⚠️ IMAP connection lost ({e}). Reconnecting in {delay:.0f}s.")
+                else:
+                    print(f"❌ Reply processing failed ({type(e).__name__}: {e}). Retrying in {delay:.0f}s.")
+                    self.offers = None  # May be half-updated: re-read from the sheet on the next event
+                self.disconnect()
+                time.sleep(delay)
+                backoff = min(backoff * 2, config.REPLY_DAEMON_MAX_BACKOFF_SECONDS)
+
+
+if __name__ == '__main__':
+    storage = None
+    if '--local' in sys.argv:
+        try:
+            storage = open_local_storage(sys.argv[sys.argv.index('--local') + 1])
+        except IndexError:
+            print("Error: --local flag must be followed by a .jsonl, snapshot .json or SQLite file.")
+            sys.exit(1)
+    storage = storage or GoogleSheetsStorage.connect()
+    if not storage:
+        sys.exit(1)
+    if not os.environ.get('GMAIL_ADDRESS') or not os.environ.get('GMAIL_APP_PASSWORD'):
+        print("❌ HR Email credentials not found. Cannot process replies.")
+        sys.exit(1)
+
+    daemon = ReplyDaemon(storage, dry_run='--dry-run' in sys.argv)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print("Stopping the reply daemon.")
+        daemon.disconnect()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+DAY = np.timedelta64(1, 'D')
+
+
+def parse_request_dates(column):
+    """Parses a column of day-first dates in one call. Unparsable dates become NaT."""
+    return pd.to_datetime(column, dayfirst=True, format='mixed', errors='coerce')
+
+
+class RequestIndex:
+    """
+    Absence requests parsed once and exploded into one row per requested day.
+
+    Start and end dates are parsed for the whole column at once, and each
+    request's bid is spread evenly over its days (rounded down, like before).
+    Several requests of the same employee for the same day add up to a single
+    daily bid, so the model needs one "off on day d" indicator per
+    (employee, day) however many requests overlap. The same index answers the
+    "which requests won" question for the offers and the token redistribution.
+    """
+
+    def __init__(self, requests_df):
+        # The requests as read, with the Employee_Name/Start_Date/End_Date/Tokens_Bid columns
+        self.requests_df = requests_df
+        if requests_df.empty:
+            self.start_dates = pd.Series([], dtype='datetime64[ns]')
+            # Typed like the exploded bids, so that e.g. `.dt` still works on the empty Date column
+            self.daily_bids = pd.DataFrame({
+                'Employee_Name': pd.Series([], dtype=object),
+                'Date': pd.Series([], dtype='datetime64[ns]'),
+                'Tokens': pd.Series([], dtype=int),
+            })
+            return
+
+        self.start_dates = parse_request_dates(requests_df['Start_Date']).reset_index(drop=True)
+        end_dates = parse_request_dates(requests_df['End_Date']).reset_index(drop=True)
+        num_days = ((end_dates - self.start_dates).dt.days + 1).fillna(0).clip(lower=0).astype(int).to_numpy()
+        bids = pd.to_numeric(requests_df['Tokens_Bid'], errors='coerce').fillna(0).astype(int).to_numpy()
+        tokens_per_day = np.where(num_days > 0, bids // np.maximum(num_days, 1), 0)
+
+        # One row per (request, day): request i is repeated num_days[i] times with offsets 0..num_days[i]-1
+        request_rows = np.repeat(np.arange(len(num_days)), num_days)
+        first_rows = np.repeat(np.cumsum(num_days) - num_days, num_days)
+        offsets = np.arange(len(request_rows)) - first_rows
+        expanded = pd.DataFrame({
+            'Employee_Name': requests_df['Employee_Name'].to_numpy()[request_rows],
+            'Date': self.start_dates.to_numpy()[request_rows] + offsets * DAY,
+            'Tokens': tokens_per_day[request_rows],
+        })
+        self.daily_bids = expanded.groupby(['Employee_Name', 'Date'], as_index=False, sort=True)['Tokens'].sum()
+
+    def __len__(self):
+        return len(self.requests_df)
+
+    def model_requests(self, horizon):
+        """
+        The daily bids inside `horizon` as ScheduleModelBuilder requests:
+        [(employee, day_number, 'OFF', tokens)], one per (employee, day).
+        """
+        requests = []
+        for employee, day, tokens in zip(self.daily_bids['Employee_Name'], self.daily_bids['Date'].dt.date, self.daily_bids['Tokens']):
+            d = horizon.index.get(day)
+            if d is not None:  # Days outside of the horizon cannot be planned
+                requests.append((employee, d + 1, 'OFF', int(tokens)))
+        return requests
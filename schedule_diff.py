@@ -0,0 +1,53 @@
+import numpy as np
+
+
+def diff_schedules(official_schedule, sandbox_schedule):
+    """
+    Compares two CompactSchedules on the same axes in a single vectorized
+    comparison of their id arrays.
+
+    Returns (all_offers, free_moves): all_offers maps each employee to the list
+    of change dicts they must agree to (the employee removed from a cell, and
+    the employee added to it when someone else is removed); free_moves lists
+    the changes that fill an empty cell and need no agreement. Changes are
+    ordered by day, then by shift.
+    """
+    all_offers = {}  # Key: employee_name, Value: list of change dicts
+    free_moves = []
+    for change_data in sandbox_schedule.changes_from(official_schedule):
+        official_employee, sandbox_employee = change_data['from'], change_data['to']
+        if official_employee:
+            all_offers.setdefault(official_employee, []).append(change_data)
+            if sandbox_employee:
+                all_offers.setdefault(sandbox_employee, []).append(change_data)
+        else:
+            free_moves.append(change_data)
+    return all_offers, free_moves
+
+
+def find_winners(request_index, schedule):
+    """
+    Returns the requests (as dicts) whose employee is not working on the first
+    day of the request in `schedule` (a CompactSchedule). `request_index` is
+    the RequestIndex holding the already parsed start dates. The start date is
+    matched to the schedule's dates when its axes have them, and to the day of
+    the month otherwise. Requests starting outside of the schedule's days are
+    never winners.
+    """
+    requests_df = request_index.requests_df
+    if requests_df.empty:
+        return []
+    axes = schedule.axes
+    start_dates = request_index.start_dates
+    if axes.dates is not None:
+        day_indexes = np.array([axes.date_index.get(day, -1) for day in start_dates.dt.date])
+    else:
+        day_indexes = start_dates.dt.day.fillna(0).astype(int).to_numpy() - 1
+    employee_ids = np.array([axes.employee_index.get(name, -1) for name in requests_df['Employee_Name']])
+    in_schedule = (day_indexes >= 0) & (day_indexes < len(axes.day_labels))
+    known = in_schedule & (employee_ids >= 0)
+
+    working = schedule.working_days()
+    is_working = np.zeros(len(requests_df), dtype=bool)
+    is_working[known] = working[employee_ids[known], day_indexes[known]]
+    return requests_df[in_schedule & ~is_working].to_dict('records')
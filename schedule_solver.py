@@ -0,0 +1,269 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ortools.sat.python import cp_model
+from model_builder import ScheduleModelBuilder, expand_pools
+import config
+import glob
+import json
+import os
+import threading
+import time
+
+
+def relative_gap(objective, bound):
+    """Relative gap between an incumbent and the best bound, as CP-SAT defines it."""
+    return abs(bound - objective) / max(1.0, abs(objective))
+
+
+class IncumbentRecorder(cp_model.CpSolverSolutionCallback):
+    """
+    Solution callback for the schedule solve.
+
+    Records each improving incumbent with its objective and bound, persists
+    the best one to disk as soon as it is found, and stops the search once the
+    relative gap limit is reached or no better incumbent has been found for
+    `no_improvement_seconds`.
+    """
+
+    def __init__(self, works, fixed_assignments=None, incumbent_path=None, gap_limit=None, no_improvement_seconds=None, pools=None, incumbent_scope=None):
+        super().__init__()
+        self.works = works
+        self.fixed_assignments = fixed_assignments or {}
+        self.pools = pools or {}
+        self.incumbent_path = incumbent_path
+        self.incumbent_scope = incumbent_scope or {}  # Saved with each incumbent, see save_incumbent
+        self.gap_limit = gap_limit
+        self.no_improvement_seconds = no_improvement_seconds
+        self.incumbents = []  # [(wall_time, objective, bound)]
+        self.best_solution = None
+        self._last_improvement = time.monotonic()
+        self._watchdog_done = threading.Event()
+
+    def OnSolutionCallback(self):
+        objective, bound = self.ObjectiveValue(), self.BestObjectiveBound()
+        if self.incumbents and objective <= self.incumbents[-1][1]:
+            return
+        self.incumbents.append((self.WallTime(), objective, bound))
+        self._last_improvement = time.monotonic()
+
+        solution = dict(self.fixed_assignments)
+        for (e, s, d), var in self.works.items():
+            if self.BooleanValue(var):
+                solution[(s, d)] = e
+        solution = expand_pools(solution, self.pools)
+        self.best_solution = solution
+        if self.incumbent_path:
+            save_incumbent(self.incumbent_path, solution, objective, bound, **self.incumbent_scope)
+
+        if self.gap_limit is not None and relative_gap(objective, bound) <= self.gap_limit:
+            self.StopSearch()
+
+    def start_watchdog(self, solver):
+        """Stops `solver` once no improving incumbent was found for the configured window."""
+        if not self.no_improvement_seconds:
+            return
+
+        def watch():
+            while not self._watchdog_done.wait(0.5):
+                if self.incumbents and time.monotonic() - self._last_improvement >= self.no_improvement_seconds:
+                    solver.StopSearch()
+                    return
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    def stop_watchdog(self):
+        self._watchdog_done.set()
+
+
+def save_incumbent(path, solution, objective, bound, horizon_start=None, num_days=None, roles=()):
+    """
+    Writes an incumbent atomically, so a killed job never leaves a truncated file.
+    Its day indexes count from `horizon_start` (an ISO date) over `num_days`,
+    and it covers every shift of `roles`.
+    """
+    payload = {
+        'objective': objective,
+        'bound': bound,
+        'saved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'horizon_start': horizon_start,
+        'num_days': num_days,
+        'roles': sorted(roles, key=str),
+        'assignments': [[shift, day, employee] for (shift, day), employee in solution.items()],
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def incumbent_path(label):
+    return os.path.join(config.INCUMBENT_DIR, f"incumbent_{label}.json")
+
+
+def clear_incumbents():
+    for path in glob.glob(incumbent_path('*')):
+        os.remove(path)
+
+
+def load_incumbents(horizon_start, num_days):
+    """
+    Merges the persisted incumbents of the horizon starting on `horizon_start`
+    (an ISO date) over `num_days` into one solution. Incumbents of another
+    horizon are skipped, since their day indexes point at other days. Returns
+    (solution, roles they cover), or (None, set()) if there is none.
+    """
+    solution, roles = {}, set()
+    for path in sorted(glob.glob(incumbent_path('*'))):
+        with open(path) as f:
+            incumbent = json.load(f)
+        if incumbent.get('horizon_start') != horizon_start or incumbent.get('num_days') != num_days:
+            print(f"⚠️ Skipping '{path}': it was solved for {incumbent.get('num_days')} days from {incumbent.get('horizon_start')}, "
+                  f"not {num_days} days from {horizon_start}.")
+            continue
+        for shift, day, employee in incumbent['assignments']:
+            solution[(shift, day)] = employee
+        roles.update(incumbent['roles'])
+    return (solution, roles) if roles else (None, set())
+
+
+def solve_schedule(problem, time_limit=None, num_workers=None, label='all', horizon_start=None):
+    """
+    Builds and solves one scheduling problem.
+
+    `problem` holds the ScheduleModelBuilder keyword arguments. Returns a
+    (status_name, solution, stats) tuple where solution maps (shift, day) to
+    the assigned employee, or is None when no solution was found, and stats
+    holds the model size and CP-SAT search statistics. The best incumbent is
+    persisted under config.INCUMBENT_DIR as `label` while solving, with the
+    horizon start date and the roles it covers.
+    """
+    build_started = time.perf_counter()
+    builder = ScheduleModelBuilder(**problem)
+    model, works = builder.build()
+    build_seconds = time.perf_counter() - build_started
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = num_workers or config.NUM_PARALLEL_WORKERS
+    solver.parameters.max_time_in_seconds = time_limit or config.SOLVER_TIME_LIMIT_SECONDS
+    solver.parameters.relative_gap_limit = config.SOLVER_RELATIVE_GAP_LIMIT
+
+    os.makedirs(config.INCUMBENT_DIR, exist_ok=True)
+    recorder = IncumbentRecorder(
+        works, builder.fixed_assignments,
+        incumbent_path=incumbent_path(label),
+        gap_limit=config.SOLVER_RELATIVE_GAP_LIMIT,
+        no_improvement_seconds=config.SOLVER_NO_IMPROVEMENT_SECONDS,
+        pools=builder.pools,
+        incumbent_scope=dict(horizon_start=horizon_start, num_days=problem['num_days'], roles=problem_roles(problem)),
+    )
+    recorder.start_watchdog(solver)
+    try:
+        status = solver.Solve(model, recorder)
+    finally:
+        recorder.stop_watchdog()
+
+    status_name = solver.StatusName(status)
+    proto = model.Proto()
+    stats = dict(
+        label=label,
+        status=status_name,
+        variables=len(proto.variables),
+        constraints=len(proto.constraints),
+        build_seconds=build_seconds,
+        pooled_employees=sum(len(members) for members in builder.pools.values()),
+        wall_time=solver.WallTime(),
+        branches=solver.NumBranches(),
+        conflicts=solver.NumConflicts(),
+        improving_solutions=len(recorder.incumbents),
+    )
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return status_name, None, stats
+
+    objective, bound = solver.ObjectiveValue(), solver.BestObjectiveBound()
+    stats.update(objective=objective, bound=bound, gap=relative_gap(objective, bound))
+    print(f"Solver [{label}]: {status_name} after {solver.WallTime():.1f}s, "
+          f"{len(recorder.incumbents)} improving solutions, objective {objective:g}, "
+          f"bound {bound:g}, gap {stats['gap']:.2%}.")
+    return status_name, recorder.best_solution, stats
+
+
+def problem_roles(problem):
+    """The roles of the employees and shifts of a problem."""
+    return set(problem['employee_roles'].values()) | {s['role'] for s in problem['shifts'].values()}
+
+
+def split_by_role(problem):
+    """
+    Splits a problem into independent components, one per role.
+
+    Every constraint of the model is scoped to a single employee or a single
+    shift, and an employee can only work the shifts of their own role, so no
+    constraint ever links two roles. Returns {role: sub_problem}.
+    """
+    components = {}
+    for role in sorted(problem_roles(problem), key=str):
+        employee_roles = {e: r for e, r in problem['employee_roles'].items() if r == role}
+        shifts = {s_id: s for s_id, s in problem['shifts'].items() if s['role'] == role}
+        components[role] = dict(
+            problem,
+            employee_roles=employee_roles,
+            shifts=shifts,
+            requests=[r for r in problem.get('requests') or [] if r[0] in employee_roles],
+            official_assignments={k: e for k, e in (problem.get('official_assignments') or {}).items() if k[0] in shifts},
+        )
+    return components
+
+
+def solve_by_role(problem, time_limit=None, horizon_start=None):
+    """
+    Solves each role component as its own CP-SAT model in a process pool and
+    merges the partial solutions. Returns (solution, [stats]) with one stats
+    dict per component; solution is None if any component has no solution.
+    `time_limit` overrides the configured time limits of every component.
+    """
+    components = split_by_role(problem)
+    if len(components) < 2:
+        _, solution, stats = solve_schedule(problem, time_limit, horizon_start=horizon_start)
+        return solution, [stats]
+
+    max_workers = min(len(components), config.NUM_PARALLEL_WORKERS)
+    workers_per_component = max(1, config.NUM_PARALLEL_WORKERS // max_workers)
+    solution = {}
+    all_stats = []
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            pool.submit(
+                solve_schedule, sub_problem,
+                time_limit or config.SOLVER_TIME_LIMIT_BY_ROLE.get(role, config.SOLVER_TIME_LIMIT_SECONDS),
+                workers_per_component,
+                role,
+                horizon_start,
+            ): role
+            for role, sub_problem in components.items()
+        }
+        # In completion order, so a role without a solution is reported as soon as it is known
+        for future in as_completed(futures):
+            role = futures[future]
+            status_name, partial, stats = future.result()
+            all_stats.append(stats)
+            if partial is None:
+                print(f"❌ No solution found for role '{role}' ({status_name}). Stopping the other roles' solves.")
+                _stop_pool(pool)
+                return None, all_stats
+            print(f"✅ Role '{role}' solved ({status_name}, {len(partial)} assignments).")
+            solution.update(partial)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return solution, all_stats
+
+
+def _stop_pool(pool):
+    """
+    Cancels the solves that have not started and terminates the running ones.
+    A CP-SAT solve cannot be interrupted from another process, and a pool
+    waits for its running tasks, even at interpreter exit, until they end.
+    """
+    processes = list((getattr(pool, '_processes', None) or {}).values())  # Cleared by shutdown
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
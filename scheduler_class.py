@@ -1,53 +1,62 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
 from datetime import datetime, timedelta, date
-import calendar
-from ortools.sat.python import cp_model
 import uuid
-import imaplib
-import email
 import time
 import os
-import smtplib
-from email.message import EmailMessage
 import config
 import json
+from sheet_snapshot import SheetSnapshot
+from offers_ledger import OffersLedger
+from token_ledger import TokenLedger
+from storage import GoogleSheetsStorage
+from write_buffer import WriteBuffer
+from tracing import Tracer
+# The solver (ortools), IMAP and SMTP subsystems are imported by the methods that use
+# them, so that e.g. reply processing never pays for loading ortools (see cli.py)
+from compact_schedule import CompactSchedule, ScheduleAxes
+from horizon import CONTEXT_DAYS, PlanningHorizon, day_label, parse_day_label
+from request_index import RequestIndex, parse_request_dates
+from schedule_diff import diff_schedules, find_winners
+
+# Offers tab status recorded for each reply keyword
+REPLY_STATUSES = {'ACCEPT': 'ACCEPTED', 'DECLINE': 'DECLINED'}
 
 class Scheduler:
-    def __init__(self, group=None, dry_run=False):
-        self.group = group
+    def __init__(self, groups=None, dry_run=False, storage=None, today=None, tracer=None, offers=None):
+        # Roles to schedule (a name or a list of names); all of them when empty
+        self.groups = [groups] if isinstance(groups, str) else list(groups or [])
         self.dry_run = dry_run
-        self.sheet = self._connect_to_sheet()
-        if self.sheet:
-            self.employees_df, self.shifts_df, self.requests_df, self.official_schedule_df, self.sandbox_df = self._read_data()
+        self.today = today  # Fixed current date (e.g. for benchmarks); defaults to now
+        self.tracer = tracer or Tracer()
+        self._mailer = None
+        if storage is None:
+            with self.tracer.span('connect'):
+                storage = self._connect_to_sheet()
+        self.storage = storage
+        if self.storage:
+            with self.tracer.span('read_sheet'):
+                self.snapshot = SheetSnapshot.load(self.storage)
+                self.offers = self._load_offers(offers)
+                self.writes = WriteBuffer(self.storage, self.snapshot, tracer=self.tracer, offers=self.offers)
+                self.employees_df, self.shifts_df, self.requests_df, self.official_schedule_df, sandbox_df = self._read_data()
+                self.request_index = RequestIndex(self.requests_df)
+                self.horizon = self._planning_horizon()
+                self.schedule_axes, self.official_schedule, self.sandbox_schedule = self._build_schedules(sandbox_df)
 
     def _connect_to_sheet(self):
         """Connects to the Google Sheet."""
-        try:
-            scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-            creds = ServiceAccountCredentials.from_json_keyfile_name('creds.json', scope)
-            client = gspread.authorize(creds)
-            spreadsheet = client.open(config.SHEET_NAME)
-            print("✅ Successfully connected to the Google Sheet.")
-            return spreadsheet
-        except Exception as e:
-            print(f"❌ Error connecting to Google Sheet: {e}")
-            return None
+        return GoogleSheetsStorage.connect()
 
     def _read_data(self):
         """Reads all required data from the Google Sheet into DataFrames."""
         print("Reading data from all tabs...")
-        employees_ws = self.sheet.worksheet(config.EMPLOYEES_TAB)
-        employees_df = pd.DataFrame(employees_ws.get_all_records())
-        if self.group:
-            employees_df = employees_df[employees_df[config.COL_EMPLOYEE_ROLE] == self.group]
+        employees_df = pd.DataFrame(self.snapshot.records(config.EMPLOYEES_TAB))
+        shifts_df = pd.DataFrame(self.snapshot.records(config.SHIFTS_TAB))
+        if self.groups:
+            employees_df = employees_df[employees_df[config.COL_EMPLOYEE_ROLE].isin(self.groups)]
+            shifts_df = shifts_df[shifts_df[config.COL_SHIFT_ROLE].isin(self.groups)]
 
-        shifts_ws = self.sheet.worksheet(config.SHIFTS_TAB)
-        shifts_df = pd.DataFrame(shifts_ws.get_all_records())
-
-        requests_ws = self.sheet.worksheet(config.REQUESTS_TAB)
-        requests_df = pd.DataFrame(requests_ws.get_all_records())
+        requests_df = pd.DataFrame(self.snapshot.records(config.REQUESTS_TAB))
         if not requests_df.empty:
             requests_df = requests_df.rename(columns={
                 config.COL_REQUEST_NAME: 'Employee_Name',
@@ -55,61 +64,169 @@ class Scheduler:
                 config.COL_REQUEST_END: 'End_Date',
                 config.COL_REQUEST_TOKENS: 'Tokens_Bid'
             })
+            if self.groups:
+                requests_df = requests_df[requests_df['Employee_Name'].isin(employees_df[config.COL_EMPLOYEE_NAME])]
 
-        official_schedule_ws = self.sheet.worksheet(config.OFFICIAL_SCHEDULE_TAB)
-        official_schedule_df = pd.DataFrame(official_schedule_ws.get_all_records())
+        official_schedule_df = pd.DataFrame(self.snapshot.records(config.OFFICIAL_SCHEDULE_TAB))
 
-        sandbox_schedule_ws = self.sheet.worksheet(config.SANDBOX_SCHEDULE_TAB)
-        sandbox_schedule_df = pd.DataFrame(sandbox_schedule_ws.get_all_records())
+        sandbox_schedule_df = pd.DataFrame(self.snapshot.records(config.SANDBOX_SCHEDULE_TAB))
+        if config.COL_SCHEDULE_SHIFT in sandbox_schedule_df.columns:
+            sandbox_schedule_df = sandbox_schedule_df.set_index(config.COL_SCHEDULE_SHIFT)
 
         return employees_df, shifts_df, requests_df, official_schedule_df, sandbox_schedule_df
 
-    def _read_offers_data(self):
-        """Reads only the Offers tab into a DataFrame."""
-        print("Reading offers data...")
-        offers_ws = self.sheet.worksheet(config.OFFERS_TAB)
-        return pd.DataFrame(offers_ws.get_all_records())
+    def _today(self):
+        today = self.today or datetime.now()
+        return today.date() if isinstance(today, datetime) else today
+
+    def _planning_horizon(self):
+        """The current month, or a rolling horizon of config.PLANNING_HORIZON_WEEKS weeks."""
+        if config.PLANNING_HORIZON_WEEKS:
+            return PlanningHorizon.rolling_weeks(self._today(), config.PLANNING_HORIZON_WEEKS)
+        return PlanningHorizon.current_month(self._today())
+
+    def _build_schedules(self, sandbox_df):
+        """
+        Interns the official schedule and the sandbox as CompactSchedules on
+        shared axes. With a rolling horizon the days are keyed by date: the axes
+        cover the official days, the days planned by earlier runs (extra sandbox
+        columns) and the new days of the horizon, in date order.
+        """
+        official = self.official_schedule_df.set_index(config.COL_SCHEDULE_SHIFT) if not self.official_schedule_df.empty else self.official_schedule_df
+        official_labels = list(official.columns)
+        day_labels, dates = official_labels, None
+        self.previous_horizon_end = None
+        if self.horizon.rolling:
+            day_labels = official_labels + [label for label in sandbox_df.columns if label not in set(official_labels)]
+            dates = [parse_day_label(label, self.horizon.today) for label in day_labels]
+            if None in dates:
+                print("⚠️ Some schedule columns are not dates. Planning the current month instead of a rolling horizon.")
+                self.horizon = PlanningHorizon.current_month(self.horizon.today)
+                day_labels, dates = official_labels, None
+            else:
+                self.previous_horizon_end = max(dates, default=None)
+                known_dates = set(dates)
+                new_dates = [day for day in self.horizon.dates if day not in known_dates]
+                columns = sorted(zip(dates + new_dates, day_labels + [day_label(day) for day in new_dates]))
+                dates, day_labels = [day for day, _ in columns], [label for _, label in columns]
+
+        axes = ScheduleAxes(official.index, day_labels, self.employees_df.get(config.COL_EMPLOYEE_NAME, []), dates)
+        self.official_day_indexes = [axes.day_index[label] for label in official_labels]
+        return axes, CompactSchedule.from_frame(axes, official), CompactSchedule.from_frame(axes, sandbox_df)
+
+    def _horizon_positions(self):
+        """Axes day index of every day of the planning horizon (-1 when it has no column)."""
+        axes = self.schedule_axes
+        if axes.dates is not None:
+            return [axes.date_index.get(day, -1) for day in self.horizon.dates]
+        return [d if d < len(axes.day_labels) else -1 for d in range(len(self.horizon.dates))]
+
+    def _carried_schedule(self):
+        """The official schedule, plus the plan of earlier runs for the days it does not cover."""
+        carried = self.official_schedule.copy()
+        carried.fill_outside(self.sandbox_schedule, self.schedule_axes.shift_ids, self.official_day_indexes)
+        return carried
+
+    def _load_offers(self, offers=None):
+        """
+        The OffersLedger of the sheet: `offers` (a ledger kept by the caller, such
+        as the reply daemon) refreshed, or one loaded from the disk cache. Only
+        the rows after the ledger's watermark are read from the sheet.
+        """
+        if offers is None:
+            offers = OffersLedger.load(self.storage, self.snapshot.revision)
+        else:
+            offers.refresh(self.storage, self.snapshot.revision)
+        self.snapshot.restore(config.OFFERS_TAB, offers.rows)
+        return offers
 
     def check_for_pending_offers(self):
         """Checks if there are any offers from a previous run that are still pending."""
         print("--- Checking for pending offers from previous runs... ---")
-        offers_df = self._read_offers_data()
-        if not offers_df.empty:
-            pending_offers = offers_df[offers_df[config.COL_OFFER_STATUS] == 'PENDING']
-            if not pending_offers.empty:
-                print(f"⚠️ Found {len(pending_offers)} pending offers. Halting to avoid duplicate offers.")
-                return True
+        if self.offers.has_pending():
+            print(f"⚠️ Found {len(self.offers.rows_with_status('PENDING'))} pending offers. Halting to avoid duplicate offers.")
+            return True
         print("✅ No pending offers found. Proceeding.")
         return False
 
-    def generate_schedule(self):
+    def generate_schedule(self, repair=False):
         """
         Generates a schedule with ALL features: dynamic dates, multi-day requests,
-        locking past days, and using the official schedule as a hint.
+        locking past days, and using the official schedule as a hint. With
+        `repair`, only the neighbourhood of the unfulfilled requests is
+        re-optimized and the rest of the carried schedule is kept as is.
         """
         print("--- Starting Schedule Generation (Full-Featured) ---")
+        with self.tracer.span('build_problem'):
+            problem = self.build_problem()
+        from schedule_solver import clear_incumbents
+        clear_incumbents()
+
+        if repair:
+            solution = self._repair(problem)
+        else:
+            solution = self._solve(problem)
+
+        if solution is not None:
+            print("✅ Schedule generated successfully.")
+            return self._schedule_from_solution(solution)
+        else:
+            print("❌ No solution found.")
+            return None
+
+    def _solve(self, problem, time_limit=None):
+        from schedule_solver import solve_by_role, solve_schedule
+        with self.tracer.span('solve', by_role=config.SOLVE_BY_ROLE, repair=problem.get('neighbourhood') is not None):
+            horizon_start = self.horizon.dates[0].isoformat()
+            if config.SOLVE_BY_ROLE:
+                solution, all_stats = solve_by_role(problem, time_limit, horizon_start)
+            else:
+                _, solution, stats = solve_schedule(problem, time_limit, horizon_start=horizon_start)
+                all_stats = [stats]
+        for stats in all_stats:
+            self.tracer.record_solver(stats)
+        return solution
+
+    def _repair(self, problem):
+        """
+        Large-neighbourhood repair: frees the days around each unfulfilled
+        request for the requester and a few colleagues, and pins every other
+        cell to the carried schedule, so the solve is small and only the
+        neighbourhood can produce offers. The neighbourhood is doubled when no
+        schedule is found, and the whole horizon is solved as a last resort.
+        """
+        from repair import repair_neighbourhood, unfulfilled_requests
+        centres = unfulfilled_requests(problem)
+        if not centres:
+            print("✅ Every request is already granted by the carried schedule. Nothing to repair.")
+            return dict(problem['official_assignments'])
+        margin_days, max_colleagues = config.REPAIR_MARGIN_DAYS, config.REPAIR_MAX_COLLEAGUES
+        for _ in range(config.REPAIR_MAX_WIDENINGS + 1):
+            neighbourhood = repair_neighbourhood(problem, centres, margin_days, max_colleagues)
+            print(f"Repairing around {sum(len(days) for days in centres.values())} unfulfilled request days: "
+                  f"{len(neighbourhood)} employees, up to {margin_days} days around each request.")
+            solution = self._solve(dict(problem, neighbourhood=neighbourhood), config.REPAIR_TIME_LIMIT_SECONDS)
+            if solution is not None:
+                return solution
+            margin_days, max_colleagues = margin_days * 2, max_colleagues * 2
+        print("⚠️ No repair found within the neighbourhood. Solving the whole horizon.")
+        return self._solve(problem)
+
+    def build_problem(self):
+        """The ScheduleModelBuilder arguments for the planning horizon of `self.today` (default: now)."""
+        horizon = self.horizon
+        if horizon.rolling:
+            print(f"✅ Planning {len(horizon.free_dates)} days up to {horizon.dates[-1]} (rolling horizon of {config.PLANNING_HORIZON_WEEKS} weeks), "
+                  f"with the last {CONTEXT_DAYS} frozen days as constants.")
+            if self.previous_horizon_end:
+                new_days = sum(1 for day in horizon.dates if day > self.previous_horizon_end)
+                print(f"Extending the previous horizon ending {self.previous_horizon_end} by {new_days} days.")
+        else:
+            print(f"✅ Detected {len(horizon.dates)} days for the current month. Locking all days up to and including Day {horizon.today.day}.")
+
+        requests = self.request_index.model_requests(horizon)
 
-        today = datetime.now()
-        _, num_days = calendar.monthrange(today.year, today.month)
-        today_index = today.day - 1
-        print(f"✅ Detected {num_days} days for the current month. Locking all days up to and including Day {today.day}.")
-
-        requests = []
-        if not self.requests_df.empty:
-            for _, row in self.requests_df.iterrows():
-                start_date = pd.to_datetime(row['Start_Date'], dayfirst=True)
-                end_date = pd.to_datetime(row['End_Date'], dayfirst=True)
-                num_request_days = (end_date - start_date).days + 1
-                tokens_per_day = row['Tokens_Bid'] // num_request_days if num_request_days > 0 else 0
-                for day_delta in range(num_request_days):
-                    current_date = start_date + timedelta(days=day_delta)
-                    requests.append((row['Employee_Name'], current_date.day, 'OFF', tokens_per_day))
-
-        all_employees = self.employees_df['Employee_Name'].tolist()
-        employees = {'Infirmier': [], 'Intérimaire': []}
-        for _, row in self.employees_df.iterrows():
-            name, role = row['Employee_Name'], row['Role']
-            if role in employees: employees[role].append(name)
+        employee_roles = dict(zip(self.employees_df['Employee_Name'], self.employees_df['Role']))
 
         shifts = {}
         for _, row in self.shifts_df.iterrows():
@@ -117,97 +234,100 @@ class Scheduler:
             applicable_days = [int(day) for day in str(row[config.COL_SHIFT_DAYS])]
             shifts[shift_id] = {'duration': int(row[config.COL_SHIFT_DURATION] * 100), 'role': row[config.COL_SHIFT_ROLE], 'days': applicable_days}
 
-        days_of_week = [d % 7 for d in range(num_days)]
-        model = cp_model.CpModel()
-        works = {}
-        for e in all_employees:
-            for s_id, s_info in shifts.items():
-                if s_info['role'] in self.employees_df[self.employees_df['Employee_Name'] == e]['Role'].values:
-                    for d in range(num_days):
-                        if days_of_week[d] in s_info['days']:
-                            works[(e, s_id, d)] = model.NewBoolVar(f'works_{e}_{s_id}_{d}')
-
-        date_columns = self.official_schedule_df.columns[1:]
-        for d in range(today_index + 1):
-            if d < len(date_columns):
-                day_col = date_columns[d]
-                for _, row in self.official_schedule_df.iterrows():
-                    shift_id, official_employee = row[config.COL_SCHEDULE_SHIFT], row[day_col]
-                    if official_employee and (official_employee in all_employees):
-                        if (official_employee, shift_id, d) in works:
-                            model.Add(works[(official_employee, shift_id, d)] == 1)
-
-        for s_id, s_info in shifts.items():
-            for d in range(num_days):
-                if days_of_week[d] in s_info['days']:
-                    model.AddExactlyOne(works.get((e, s_id, d), 0) for e in employees[s_info['role']])
-        for e in all_employees:
-            for d in range(num_days): model.AddAtMostOne(works.get((e, s_id, d), 0) for s_id in shifts)
-        for e in all_employees:
-            if e != 'INT1':
-                for d in range(num_days - 6):
-                    worked_days = [works[key] for key in works if key[0] == e and d <= key[2] < d + 7]
-                    model.Add(sum(worked_days) <= 6)
-
-        request_bonuses = []
-        if requests:
-          for emp, day, shift_type, penalty in requests:
-              day_index = day - 1
-              if shift_type == 'OFF':
-                  is_working_on_day = [works[key] for key in works if key[0] == emp and key[2] == day_index]
-                  request_fulfilled = model.NewBoolVar(f'request_{emp}_{day_index}')
-                  model.Add(sum(is_working_on_day) == 0).OnlyEnforceIf(request_fulfilled)
-                  model.Add(sum(is_working_on_day) > 0).OnlyEnforceIf(request_fulfilled.Not())
-                  request_bonuses.append(penalty * request_fulfilled)
-
-        hint_bonuses = []
-        for d in range(today_index + 1, num_days):
-            if d < len(date_columns):
-                day_col = date_columns[d]
-                for _, row in self.official_schedule_df.iterrows():
-                    shift_id, official_employee = row[config.COL_SCHEDULE_SHIFT], row[day_col]
-                    if official_employee and (official_employee in all_employees):
-                        if (official_employee, shift_id, d) in works:
-                            hint_bonuses.append(works[(official_employee, shift_id, d)])
-
-        model.Maximize(sum(request_bonuses) + sum(hint_bonuses))
-
-        solver = cp_model.CpSolver()
-        solver.parameters.num_search_workers = config.NUM_PARALLEL_WORKERS
-        solver.parameters.max_time_in_seconds = config.SOLVER_TIME_LIMIT_SECONDS
-        status = solver.Solve(model)
-
-        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-            print("✅ Schedule generated successfully.")
-            solution = {}
-            for (e, s, d), var in works.items():
-                if solver.Value(var):
-                    solution[(s, d)] = e
-            return solution
-        else:
-            print("❌ No solution found.")
+        return dict(
+            employee_roles=employee_roles,
+            shifts=shifts,
+            num_days=len(horizon.dates),
+            requests=requests,
+            official_assignments=self._official_assignments(employee_roles),
+            today_index=horizon.today_index,
+            first_weekday=horizon.first_weekday,
+        )
+
+    def preview_requests(self, requests):
+        """
+        What-if preview of hypothetical absence requests, without writing anything.
+        `requests` is a list of dicts (or a DataFrame) with the Employee_Name,
+        Start_Date, End_Date and Tokens_Bid columns. Returns one dict per request
+        with its status, whether it would be granted, the minimum winning bid,
+        the number of colleagues who would get an offer and the blocked days.
+        """
+        requests_df = pd.DataFrame(requests)
+        if requests_df.empty:
+            return []
+        with self.tracer.span('preview', requests=len(requests_df)):
+            start_dates = parse_request_dates(requests_df['Start_Date'])
+            end_dates = parse_request_dates(requests_df['End_Date'])
+            scenarios = []
+            for employee, start, end, bid in zip(requests_df['Employee_Name'], start_dates, end_dates, requests_df['Tokens_Bid']):
+                num_days = (end - start).days + 1 if not (pd.isna(start) or pd.isna(end)) else 0
+                days = [self.horizon.index[day] for day in (start.date() + timedelta(days=i) for i in range(max(num_days, 0))) if day in self.horizon.index]
+                scenarios.append(dict(employee=employee, tokens_bid=int(pd.to_numeric(bid, errors='coerce') or 0), num_days=max(num_days, 1), days=days))
+            from bid_preview import preview_requests
+            results = preview_requests(self.build_problem(), scenarios)
+
+        previews = []
+        for request, result in zip(requests_df.to_dict('records'), results):
+            preview = dict(request, status=result['status'], granted=result['granted'], min_bid=result['min_bid'],
+                           offers=result['offers'], blocked_days=[self.horizon.dates[d].isoformat() for d in result['blocked_days']])
+            if preview['min_bid'] is not None:
+                min_bid = f"minimum bid {preview['min_bid']}"
+            else:
+                min_bid = 'minimum bid unknown' if preview['status'] == 'unknown' else 'no bid can win'
+            print(f"{'✅' if preview['granted'] else '❌'} {request['Employee_Name']} {request['Start_Date']} - {request['End_Date']} "
+                  f"({request['Tokens_Bid']} tokens): {preview['status']}, {min_bid}, {preview['offers']} offers.")
+            previews.append(preview)
+        return previews
+
+    def load_incumbent_solution(self):
+        """
+        Loads the best schedule persisted by an interrupted generate_schedule
+        run for the current horizon. The roles that had no incumbent yet keep
+        the carried schedule.
+        """
+        from schedule_solver import load_incumbents
+        solution, roles = load_incumbents(self.horizon.dates[0].isoformat(), len(self.horizon.dates))
+        if solution is None:
+            print(f"❌ No persisted incumbent of the current horizon found in '{config.INCUMBENT_DIR}'.")
             return None
+        print(f"✅ Loaded a persisted incumbent with {len(solution)} assignments for {', '.join(sorted(roles, key=str))}.")
+        missing = set(self.shifts_df[config.COL_SHIFT_ROLE]) - roles if not self.shifts_df.empty else set()
+        if missing:
+            print(f"⚠️ No incumbent for {', '.join(sorted(missing, key=str))}. Keeping the carried schedule of those roles.")
+        return self._schedule_from_solution(solution, roles)
 
-    def create_and_send_offers(self, solution):
+    def _schedule_from_solution(self, solution, roles=None):
+        """
+        The solution (keyed by horizon day) as a CompactSchedule. Cells outside of
+        the solved shifts and days, such as the shifts of the groups that were not
+        scheduled (or of other `roles` than the solved ones), keep their carried
+        assignments, so they never produce offers.
+        """
+        positions = self._horizon_positions()
+        schedule = CompactSchedule.from_solution(self.schedule_axes, {
+            (shift_id, positions[d]): employee
+            for (shift_id, d), employee in solution.items() if d < len(positions) and positions[d] >= 0
+        })
+        shifts_df = self.shifts_df
+        if roles is not None and not shifts_df.empty:
+            shifts_df = shifts_df[shifts_df[config.COL_SHIFT_ROLE].isin(roles)]
+        scheduled_shifts = list(shifts_df[config.COL_SHIFT_ID]) if not shifts_df.empty else []
+        schedule.fill_outside(self._carried_schedule(), scheduled_shifts, [p for p in positions if p >= 0])
+        return schedule
+
+    def _official_assignments(self, employee_roles):
+        """Maps (shift_id, horizon day) to the employee of the official schedule (or of an earlier run's plan)."""
+        horizon_days = {position: d for d, position in enumerate(self._horizon_positions()) if position >= 0}
+        return {
+            (shift_id, horizon_days[position]): employee
+            for (shift_id, position), employee in self._carried_schedule().to_solution().items()
+            if position in horizon_days and employee in employee_roles
+        }
+
+    def create_and_send_offers(self, sandbox):
+        """Offers the changes of the `sandbox` CompactSchedule. Returns the sandbox."""
         print("--- Creating and Sending Schedule Change Offers ---")
-        sandbox_data = {}
-        date_columns = self.official_schedule_df.columns[1:]
-        for col in date_columns:
-            sandbox_data[col] = []
-            day_index = date_columns.get_loc(col)
-            for shift_id in self.official_schedule_df[config.COL_SCHEDULE_SHIFT]:
-                employee = solution.get((shift_id, day_index), '')
-                sandbox_data[col].append(employee)
-        sandbox_df = pd.DataFrame(sandbox_data, index=self.official_schedule_df[config.COL_SCHEDULE_SHIFT])
-
-        winners = []
-        if not self.requests_df.empty:
-            for _, request in self.requests_df.iterrows():
-                emp, day = request['Employee_Name'], pd.to_datetime(request['Start_Date'], dayfirst=True).day
-                day_col = self.official_schedule_df.columns[day]
-                is_working = any(sandbox_df.loc[shift_id, day_col] == emp for shift_id in sandbox_df.index)
-                if not is_working:
-                    winners.append(request)
+        winners = find_winners(self.request_index, sandbox)
 
         requester_name = ", ".join(w['Employee_Name'] for w in winners) if winners else "SYSTEM"
         # For simplicity, we'll use the first winner's bid for the reward email.
@@ -217,38 +337,15 @@ class Scheduler:
         app_password = os.environ.get('GMAIL_APP_PASSWORD')
         if not sender_email or not app_password:
             print("❌ Email credentials not found. Cannot send offers.")
-            return sandbox_df
+            return sandbox
 
-        offers_ws = self.sheet.worksheet(config.OFFERS_TAB)
         offers_to_log = []
+        outgoing = []
 
-        all_offers = {} # Key: employee_name, Value: list of change dicts
-        for day_col in date_columns:
-            for shift_id in self.official_schedule_df[config.COL_SCHEDULE_SHIFT]:
-                official_employee = self.official_schedule_df.loc[self.official_schedule_df[config.COL_SCHEDULE_SHIFT] == shift_id, day_col].iloc[0]
-                sandbox_employee = sandbox_df.loc[shift_id, day_col]
-                official_employee = '' if pd.isna(official_employee) else official_employee
-                sandbox_employee = '' if pd.isna(sandbox_employee) else sandbox_employee
-
-                if official_employee != sandbox_employee:
-                    change_data = {
-                        'day': day_col,
-                        'shift': shift_id,
-                        'from': official_employee,
-                        'to': sandbox_employee
-                    }
-
-                    # Add change to the person being removed (if any)
-                    if official_employee:
-                        if official_employee not in all_offers: all_offers[official_employee] = []
-                        all_offers[official_employee].append(change_data)
-
-                    # Add change to the person being added (if it's not a free move)
-                    if sandbox_employee and official_employee:
-                        if sandbox_employee not in all_offers: all_offers[sandbox_employee] = []
-                        all_offers[sandbox_employee].append(change_data)
-                    elif sandbox_employee:
-                        print(f"INFO: Auto-approving free move for {sandbox_employee} to shift '{shift_id}' on {day_col}.")
+        # Key: employee_name, Value: list of change dicts
+        all_offers, free_moves = diff_schedules(self.official_schedule, sandbox)
+        for change in free_moves:
+            print(f"INFO: Auto-approving free move for {change['to']} to shift '{change['shift']}' on {change['day']}.")
 
         for employee_name, changes in all_offers.items():
             offer_id = str(uuid.uuid4())
@@ -278,33 +375,46 @@ class Scheduler:
                 f"This offer is valid for 1 hour. Offer ID: {offer_id}"
             )
 
-            self._send_email(recipient_email, 'Schedule Change Proposal', email_body)
+            outgoing.append((recipient_email, 'Schedule Change Proposal', email_body))
 
             changes_json = json.dumps(changes)
             expiry_time = (datetime.now() + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
             offers_to_log.append([offer_id, employee_name, "PENDING", expiry_time, requester_name, changes_json])
+        self.tracer.count('offers.created', len(offers_to_log))
+        self.tracer.count('offers.free_moves', len(free_moves))
+
+        # Offers go out concurrently over pooled SMTP sessions; each delivery is logged with its offer.
+        deliveries = self._send_emails(outgoing)
+        for offer_row, delivery in zip(offers_to_log, deliveries):
+            offer_row.extend(['SENT' if delivery.ok else f"FAILED: {delivery.error}", delivery.latency_ms])
+        failed_count = sum(1 for delivery in deliveries if not delivery.ok)
+        if failed_count:
+            print(f"⚠️ {failed_count} of {len(deliveries)} offer emails could not be delivered.")
 
         if offers_to_log and not self.dry_run:
-            offers_ws.append_rows(offers_to_log)
+            self.writes.append_rows(config.OFFERS_TAB, offers_to_log)
             print(f"✅ Logged {len(offers_to_log)} new offers to the 'Offers' tab.")
         elif offers_to_log:
             print(f"DRY RUN: Would have logged {len(offers_to_log)} new offers.")
 
         if not self.dry_run:
-            sandbox_ws = self.sheet.worksheet(config.SANDBOX_SCHEDULE_TAB)
-            sandbox_ws.update([sandbox_df.columns.values.tolist()] + sandbox_df.reset_index().values.tolist())
+            self.writes.update(config.SANDBOX_SCHEDULE_TAB, sandbox.to_values(config.COL_SCHEDULE_SHIFT))
             print("✅ Sandbox_Schedule tab has been updated.")
 
-            metadata_ws = self.sheet.worksheet(config.METADATA_TAB)
-            metadata_ws.update_acell(config.METADATA_CELL_REQUESTERS, requester_name)
+            self.writes.update(config.METADATA_TAB, [[requester_name]], config.METADATA_CELL_REQUESTERS)
             print(f"✅ Logged requesters '{requester_name}' to metadata sheet.")
         else:
             print("DRY RUN: Would have updated the Sandbox_Schedule tab.")
             print(f"DRY RUN: Would have logged requesters '{requester_name}' to metadata sheet.")
 
-        return sandbox_df
+        return sandbox
 
-    def process_email_replies(self):
+    def process_email_replies(self, inbox=None):
+        """
+        Records the ACCEPT-/DECLINE- replies that arrived since the last checkpoint.
+        A connected ReplyInbox can be passed in (e.g. by the reply daemon); it is
+        left open, otherwise one is opened and logged out after the flush.
+        """
         print("--- Processing Email Replies ---")
         accepted_count = 0
         declined_count = 0
@@ -315,83 +425,134 @@ class Scheduler:
                 print("❌ HR Email credentials not found. Cannot process replies.")
                 return 0, 0
 
-            offers_ws = self.sheet.worksheet(config.OFFERS_TAB)
-
-            mail = imaplib.IMAP4_SSL("imap.gmail.com")
-            mail.login(hr_email, app_password)
-            mail.select("inbox")
-
-            status, data_accept = mail.search(None, '(UNSEEN SUBJECT "ACCEPT-")')
-            status, data_decline = mail.search(None, '(UNSEEN SUBJECT "DECLINE-")')
-
-            all_ids = data_accept[0].split() + data_decline[0].split()
-
-            for num in all_ids:
-                status, data = mail.fetch(num, '(RFC822)')
-                msg = email.message_from_bytes(data[0][1])
-                subject = msg['subject']
-
+            status_col = self.writes.column(config.OFFERS_TAB, config.COL_OFFER_STATUS)
+            seen_ids = []
+            confirmations = []
+
+            owns_inbox = inbox is None
+            with self.tracer.span('imap_fetch'):
+                if owns_inbox:
+                    from inbox import ReplyInbox
+                    inbox = ReplyInbox(hr_email, app_password).connect()
+                watermark = self.snapshot.acell(config.METADATA_TAB, config.METADATA_CELL_IMAP_WATERMARK)
+                replies, new_watermark = inbox.fetch_new_replies(watermark)
+            print(f"Found {len(replies)} new replies since checkpoint '{watermark or 'none'}'.")
+            self.tracer.count('replies.received', len(replies))
+
+            unresolved = []  # Replies whose offer is not in the Offers tab yet; retried on the next run
+            for uid, subject in replies:
                 try:
-                    response, offer_id = subject.split('-')
-                    if response.upper() == 'ACCEPT':
-                        accepted_count += 1
-                    elif response.upper() == 'DECLINE':
-                        declined_count += 1
-
-                    cell = offers_ws.find(offer_id)
-                    if cell:
+                    response, offer_id = subject.split('-', 1)
+                    if response.upper() not in REPLY_STATUSES:
+                        raise ValueError(response)
+
+                    row_index = self.offers.row(offer_id)
+                    if row_index and self.offers.status(offer_id) == 'EXPIRED':
+                        print(f"⚠️ Offer {offer_id} expired before the reply arrived. Ignoring it.")
+                        if not self.dry_run:
+                            seen_ids.append(uid)
+                    elif row_index:
+                        new_status = REPLY_STATUSES[response.upper()]
+                        if response.upper() == 'ACCEPT':
+                            accepted_count += 1
+                        else:
+                            declined_count += 1
                         if not self.dry_run:
-                            offers_ws.update_cell(cell.row, 4, response.upper())
-                            mail.store(num, '+FLAGS', '\\Seen')
+                            self.writes.update_cells(config.OFFERS_TAB, [(row_index, status_col, new_status)])
+                            seen_ids.append(uid)
 
-                        print(f"✅ Processed reply for Offer {offer_id}. Status set to {response.upper()}.")
+                        print(f"✅ Processed reply for Offer {offer_id}. Status set to {new_status}.")
 
-                        # Send confirmation email
-                        employee_name = offers_ws.cell(cell.row, 2).value
+                        # Send the confirmation email once the status is actually saved
+                        employee_name = self.offers.value(row_index, config.COL_OFFER_EMPLOYEE)
                         employee_email = self.employees_df[self.employees_df[config.COL_EMPLOYEE_NAME] == employee_name][config.COL_EMPLOYEE_EMAIL].iloc[0]
                         confirmation_subject = "Your Response Has Been Recorded"
                         confirmation_body = f"Thank you, your response ('{response.upper()}') for Offer ID {offer_id} has been successfully recorded."
-                        self._send_email(employee_email, confirmation_subject, confirmation_body)
+                        confirmations.append((employee_email, confirmation_subject, confirmation_body))
+                    else:
+                        # E.g. a reply that arrived before send_offers flushed its Offers rows
+                        print(f"⚠️ No offer {offer_id} in the Offers tab yet. Keeping the reply (UID {uid}) for the next run.")
+                        self.tracer.count('replies.unmatched')
+                        unresolved.append(uid)
                 except ValueError:
-                    print(f"⚠️ Could not parse subject: '{subject}'. Skipping.")
+                    print(f"⚠️ Could not parse subject: '{subject}'. Dropping the reply (UID {uid}).")
+                    self.tracer.count('replies.unparsed')
                     continue
 
+            if unresolved:
+                # The checkpoint stays below the oldest unmatched reply, so it is searched again
+                new_watermark = inbox.watermark_before(min(unresolved))
+            if not self.dry_run:
+                self.writes.update(config.METADATA_TAB, [[new_watermark]], config.METADATA_CELL_IMAP_WATERMARK)
+            def close_inbox():
+                inbox.mark_seen(seen_ids)
+                if owns_inbox:
+                    inbox.logout()
+                    self.tracer.count_all('imap', inbox.commands)
+            self.writes.after_flush(close_inbox)
+            if confirmations:
+                self.writes.after_flush(lambda: self._send_emails(confirmations))
+
         except Exception as e:
             print(f"❌ An error occurred while processing email replies: {e}")
 
+        self.tracer.count('replies.accepted', accepted_count)
+        self.tracer.count('replies.declined', declined_count)
         return accepted_count, declined_count
 
-    def finalize_schedule(self, sandbox_df):
+    def pending_offer_deadlines(self):
+        """[(expiry datetime, offer_id)] of the offers still waiting for a reply."""
+        deadlines = []
+        for row_index in self.offers.rows_with_status('PENDING'):
+            try:
+                expiry = datetime.strptime(self.offers.value(row_index, config.COL_OFFER_EXPIRY), '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                continue
+            deadlines.append((expiry, self.offers.value(row_index, config.COL_OFFER_ID)))
+        return deadlines
+
+    def expire_offers(self, offer_ids):
+        """Marks the given offers as EXPIRED if they are still PENDING. Returns the expired ids."""
+        status_col = self.writes.column(config.OFFERS_TAB, config.COL_OFFER_STATUS)
+        expired = []
+        for offer_id in offer_ids:
+            row_index = self.offers.row(offer_id)
+            if row_index and self.offers.status(offer_id) == 'PENDING':
+                expired.append(offer_id)
+                if not self.dry_run:
+                    self.writes.update_cells(config.OFFERS_TAB, [(row_index, status_col, 'EXPIRED')])
+        if expired:
+            print(f"⌛ {len(expired)} offers expired without a reply.")
+            self.tracer.count('offers.expired', len(expired))
+        return expired
+
+    def finalize_schedule(self, sandbox):
+        """Reverts the changes of declined or expired offers. Returns the final CompactSchedule."""
         print("--- Finalizing Sandbox Schedule Based on Responses ---")
-        offers_ws = self.sheet.worksheet(config.OFFERS_TAB)
-        offer_data = pd.DataFrame(offers_ws.get_all_records())
+        failed_offers = self.offers.failed_offers()
 
-        failed_offers = offer_data[offer_data['Status'].isin(['DECLINED', 'PENDING'])]
-
-        if failed_offers.empty:
+        if not failed_offers:
             print("✅ All offers were accepted. Sandbox is ready for approval.")
-            return sandbox_df
+            return sandbox
 
         print(f"Found {len(failed_offers)} declined or expired offers. Reverting changes...")
 
-        final_sandbox_df = sandbox_df.copy()
+        final_sandbox = sandbox.copy()
 
         failed_requesters = set()
 
-        for _, offer in failed_offers.iterrows():
+        for offer in failed_offers:
             failed_requesters.add(offer[config.COL_OFFER_REQUESTER])
 
             try:
                 changes_to_revert = json.loads(offer[config.COL_OFFER_CHANGES_JSON])
-                for change in changes_to_revert:
-                    final_sandbox_df.loc[change['shift'], change['day']] = change['from']
+                final_sandbox.revert(changes_to_revert)
             except (json.JSONDecodeError, KeyError) as e:
                 print(f"⚠️ Could not parse or revert changes for offer {offer[config.COL_OFFER_ID]}. Error: {e}")
                 continue
 
         if not self.dry_run:
-            sandbox_ws = self.sheet.worksheet(config.SANDBOX_SCHEDULE_TAB)
-            sandbox_ws.update([final_sandbox_df.columns.values.tolist()] + final_sandbox_df.reset_index().values.tolist())
+            self.writes.update(config.SANDBOX_SCHEDULE_TAB, final_sandbox.to_values(config.COL_SCHEDULE_SHIFT))
             print("✅ Sandbox schedule has been updated with reverted changes.")
         else:
             print("DRY RUN: Would have updated the Sandbox_Schedule tab with reverted changes.")
@@ -401,31 +562,19 @@ class Scheduler:
             # In a real implementation, an email would be sent here.
             # This would also be wrapped in `if not self.dry_run:`.
 
-        return final_sandbox_df
+        return final_sandbox
 
-    def redistribute_tokens(self, final_sandbox_df):
+    def redistribute_tokens(self, final_sandbox):
         """
         Redistributes tokens from request winners to the first employee who accepts
         an offer to cover the shift(s).
         """
         print("--- Starting Token Redistribution (First-Come, First-Served) ---")
 
-        employees_ws = self.sheet.worksheet(config.EMPLOYEES_TAB)
-        emp_data = employees_ws.get_all_records()
-        token_balances = {row[config.COL_EMPLOYEE_NAME]: row[config.COL_EMPLOYEE_TOKENS] for row in emp_data}
-
-        offers_ws = self.sheet.worksheet(config.OFFERS_TAB)
-        offer_data = pd.DataFrame(offers_ws.get_all_records())
+        tokens = TokenLedger(self.snapshot)
 
         # Find winning requests based on the final, confirmed schedule
-        winners = []
-        if not self.requests_df.empty:
-            for _, request in self.requests_df.iterrows():
-                emp, day = request['Employee_Name'], pd.to_datetime(request['Start_Date'], dayfirst=True).day
-                day_col = self.official_schedule_df.columns[day]
-                is_working = any(final_sandbox_df.loc[shift_id, day_col] == emp for shift_id in final_sandbox_df.index)
-                if not is_working:
-                    winners.append(request)
+        winners = find_winners(self.request_index, final_sandbox)
 
         if not winners:
             print("No winning requests to process for token redistribution.")
@@ -435,67 +584,64 @@ class Scheduler:
             winner_name = winner['Employee_Name']
             tokens_to_distribute = winner['Tokens_Bid']
 
-            # Find offers associated with this winner's request
-            related_offers = offer_data[offer_data[config.COL_OFFER_REQUESTER] == winner_name]
-            accepted_offers = related_offers[related_offers[config.COL_OFFER_STATUS] == 'ACCEPTED']
+            # Find the first employee who accepted an offer made for this winner's request
+            accepted_offer = self.offers.first_accepted(winner_name)
 
-            if not accepted_offers.empty:
-                # Find the first employee who accepted
-                first_responder = accepted_offers.iloc[0][config.COL_OFFER_EMPLOYEE]
-
-                print(f"Processing win for {winner_name}. Awarding {tokens_to_distribute} tokens to first responder: {first_responder}.")
-
-                # Update token balances
-                token_balances[winner_name] -= tokens_to_distribute
-                token_balances[first_responder] += tokens_to_distribute
-            else:
+            if accepted_offer is None:
                 print(f"No accepted offers found for {winner_name}'s request. No tokens redistributed.")
-
-        # Batch update the token balances in the Google Sheet
-        employees_to_update = employees_ws.col_values(1)
-        cell_updates = []
-        for emp_name, new_balance in token_balances.items():
-            try:
-                row_index = employees_to_update.index(emp_name) + 1
-                cell_updates.append(gspread.Cell(row_index, 4, new_balance))
-                cell_updates.append(gspread.Cell(row_index, 6, new_balance))
-            except ValueError:
                 continue
+            first_responder = accepted_offer[config.COL_OFFER_EMPLOYEE]
+            if tokens.transfer(accepted_offer[config.COL_OFFER_ID], winner_name, first_responder, tokens_to_distribute):
+                print(f"Processing win for {winner_name}. Awarding {tokens_to_distribute} tokens to first responder: {first_responder}.")
+            else:
+                print(f"Tokens for offer {accepted_offer[config.COL_OFFER_ID]} were already transferred. Skipping {winner_name}'s win.")
 
-        if cell_updates and not self.dry_run:
-            employees_ws.update_cells(cell_updates)
-            print("✅ Token balances have been updated in the Google Sheet.")
-        elif cell_updates:
+        # Only the balances that changed are written, with the new journal entries, in the run's batch
+        if not self.dry_run:
+            changed = tokens.write(self.writes)
+            if changed:
+                print(f"✅ Token balances of {changed} employees have been updated in the Google Sheet.")
+        else:
             print("DRY RUN: Would have updated token balances in the Google Sheet.")
 
+    @property
+    def mailer(self):
+        """Pooled SMTP mailer, created on first use."""
+        if self._mailer is None:
+            from mailer import Mailer
+            self._mailer = Mailer(os.environ.get('GMAIL_ADDRESS'), os.environ.get('GMAIL_APP_PASSWORD'), dry_run=self.dry_run)
+        return self._mailer
+
     def _send_email(self, recipient_email, subject, body):
         """A helper function to send emails."""
+        return self._send_emails([(recipient_email, subject, body)])[0].ok
+
+    def _send_emails(self, messages):
+        """Sends [(recipient, subject, body)] concurrently. Returns one Delivery per message."""
+        from mailer import Delivery
         sender_email = os.environ.get('GMAIL_ADDRESS')
         app_password = os.environ.get('GMAIL_APP_PASSWORD')
         if not sender_email or not app_password:
             print("❌ Email credentials not found. Cannot send email.")
-            return False
-
-        if self.dry_run:
-            print(f"DRY RUN: Would send email to {recipient_email} with subject '{subject}'.")
-            return True
-
-        msg = EmailMessage()
-        msg.set_content(body)
-        msg['Subject'] = subject
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-
-        try:
-            server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
-            server.login(sender_email, app_password)
-            server.send_message(msg)
-            server.quit()
-            print(f"✅ Email sent successfully to {recipient_email}.")
-            return True
-        except Exception as e:
-            print(f"❌ Failed to send email to {recipient_email}: {e}")
-            return False
+            deliveries = [Delivery(recipient, subject, False, 0, 'missing credentials') for recipient, subject, _ in messages]
+        else:
+            with self.tracer.span('send_emails', count=len(messages)):
+                deliveries = self.mailer.send_many(messages)
+        sent_count = sum(1 for delivery in deliveries if delivery.ok)
+        self.tracer.count('emails.sent', sent_count)
+        self.tracer.count('emails.failed', len(deliveries) - sent_count)
+        return deliveries
+
+    def close(self):
+        """Closes the pooled SMTP sessions."""
+        if self._mailer is not None:
+            self._mailer.close()
+
+    def export_trace(self, path=None):
+        """Adds the storage API call counts to the run's trace and writes it as JSON."""
+        if self.storage:
+            self.tracer.count_all('storage', self.storage.api_calls)
+        return self.tracer.export(path)
 
     def send_hr_summary(self, accepted_count, declined_count, requester_names):
         print("--- Sending HR Summary Email ---")
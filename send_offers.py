@@ -1,23 +1,58 @@
 from scheduler_class import Scheduler
+from storage import open_local_storage
+from tracing import Tracer
 import sys
 
-if __name__ == '__main__':
-    group = None
-    if '--group' in sys.argv:
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # '--group Nurses,ASSC' or '--group Nurses --group ASSC'; every group when omitted.
+    # All the groups share one sheet read, one process pool solve and one flush.
+    groups = []
+    for flag_index, arg in enumerate(argv):
+        if arg == '--group':
+            if flag_index + 1 >= len(argv) or argv[flag_index + 1].startswith('--'):
+                print("Error: --group flag must be followed by one or more comma-separated group names.")
+                return 1
+            groups.extend(group for group in argv[flag_index + 1].split(',') if group)
+
+    storage = None
+    if '--local' in argv:
         try:
-            group_index = sys.argv.index('--group') + 1
-            group = sys.argv[group_index]
-        except (ValueError, IndexError):
-            print("Error: --group flag must be followed by a group name.")
-            sys.exit(1)
-
-    is_dry_run = '--dry-run' in sys.argv
-
-    scheduler = Scheduler(group=group, dry_run=is_dry_run)
-    if scheduler.sheet:
-        if scheduler.check_for_pending_offers():
-            sys.exit(0) # Exit gracefully to prevent duplicate offers
-
-        solution = scheduler.generate_schedule()
-        if solution:
-            scheduler.create_and_send_offers(solution)
+            storage = open_local_storage(argv[argv.index('--local') + 1])
+        except IndexError:
+            print("Error: --local flag must be followed by a .jsonl, snapshot .json or SQLite file.")
+            return 1
+
+    is_dry_run = '--dry-run' in argv
+    from_incumbent = '--from-incumbent' in argv
+    # Only re-plans around the requests the current schedule does not grant yet
+    repair = '--repair' in argv
+
+    tracer = Tracer("send_offers_" + "+".join(groups) if groups else "send_offers")
+    scheduler = Scheduler(groups=groups, dry_run=is_dry_run, storage=storage, tracer=tracer)
+    try:
+        if scheduler.storage:
+            with tracer.span('pending_check'):
+                has_pending_offers = scheduler.check_for_pending_offers()
+            if has_pending_offers:
+                return 0 # Exit gracefully to prevent duplicate offers
+
+            if from_incumbent:
+                with tracer.span('load_incumbent'):
+                    solution = scheduler.load_incumbent_solution()
+            else:
+                with tracer.span('generate_schedule'):
+                    solution = scheduler.generate_schedule(repair=repair)
+            if solution:
+                # All sheet writes of the run are sent in a single batch at the end
+                with tracer.span('offers'), scheduler.writes.transaction():
+                    scheduler.create_and_send_offers(solution)
+            scheduler.close()
+    finally:
+        scheduler.export_trace()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import json
+import os
+import config
+
+
+def numericise(value):
+    """Converts numeric strings to int/float, the way gspread's get_all_records does."""
+    if not isinstance(value, str) or value == '' or '_' in value:
+        return value
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def a1_to_rowcol(label):
+    """Converts an A1 label such as 'B3' into a 1-based (row, col) tuple."""
+    letters = label.rstrip('0123456789').upper()
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord('A') + 1
+    return int(label[len(letters):]), col
+
+
+def rowcol_to_a1(row, col):
+    """Converts a 1-based (row, col) tuple into an A1 label such as 'B3'."""
+    letters = ''
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return f"{letters}{row}"
+
+
+def records_from_values(values):
+    """Turns raw rows (header first) into a list of dicts, like get_all_records."""
+    if not values:
+        return []
+    header = values[0]
+    records = []
+    for row in values[1:]:
+        row = list(row) + [''] * (len(header) - len(row))
+        records.append({key: numericise(value) for key, value in zip(header, row)})
+    return records
+
+
+class SheetSnapshot:
+    """
+    In-memory copy of every configured tab, fetched in a single batched values
+    request and cached on local disk.
+
+    The cache is keyed by the storage revision (the spreadsheet's last
+    modification time for Google Sheets), so when the sheet has not changed
+    since the previous run the snapshot is loaded from disk and the only API
+    call left is the revision lookup. Backends that are already local
+    (cache_key is None) are read directly.
+    """
+
+    def __init__(self, storage, tabs, revision, values):
+        self.storage = storage
+        self.tabs = tabs
+        self.revision = revision
+        self._values = values  # {tab: [[header...], [row...], ...]}
+
+    @classmethod
+    def load(cls, storage, tabs=None, cache_dir=None):
+        tabs = list(tabs or config.SNAPSHOT_TABS)
+        revision = storage.revision()
+        if storage.cache_key is None:
+            return cls(storage, tabs, revision, storage.fetch_values(tabs))
+
+        cache_dir = cache_dir or config.SNAPSHOT_DIR
+        cache_path = os.path.join(cache_dir, f"{storage.cache_key}.json")
+        cached = cls._read_cache(cache_path)
+        if cached and cached.get('revision') == revision and all(tab in cached['values'] for tab in tabs):
+            print(f"✅ Sheet unchanged since {revision}. Using the local snapshot.")
+            return cls(storage, tabs, revision, cached['values'])
+
+        print(f"Fetching {len(tabs)} tabs in one batch (revision {revision})...")
+        snapshot = cls(storage, tabs, revision, storage.fetch_values(tabs))
+        snapshot._write_cache(cache_path)
+        return snapshot
+
+    @staticmethod
+    def _read_cache(cache_path):
+        try:
+            with open(cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, cache_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'revision': self.revision, 'values': self._values}, f)
+        os.replace(tmp_path, cache_path)
+
+    def values(self, tab):
+        """Raw rows of a tab, header first. Tabs invalidated by a write are re-fetched."""
+        if tab not in self._values:
+            self._values[tab] = self.storage.fetch_tab(tab)
+        return self._values[tab]
+
+    def records(self, tab):
+        return records_from_values(self.values(tab))
+
+    def acell(self, tab, label):
+        """Value of an A1-notation cell, '' when it is outside the data."""
+        row, col = a1_to_rowcol(label)
+        rows = self.values(tab)
+        if row > len(rows) or col > len(rows[row - 1]):
+            return ''
+        return rows[row - 1][col - 1]
+
+    def set_cells(self, tab, cells):
+        """Applies [(row, col, value)] writes to the in-memory copy of a tab."""
+        rows = self.values(tab)
+        for row, col, value in cells:
+            rows.extend([] for _ in range(row - len(rows)))
+            current = rows[row - 1]
+            current.extend([''] * (col - len(current)))
+            current[col - 1] = value
+
+    def restore(self, tab, rows):
+        self._values[tab] = rows
+
+    def invalidate(self, tab):
+        """Drops a tab after it was written to, so the next read sees the new values."""
+        self._values.pop(tab, None)
@@ -0,0 +1,257 @@
+from collections import Counter
+import json
+import sqlite3
+import config
+from sheet_snapshot import a1_to_rowcol, rowcol_to_a1
+
+
+class GoogleSheetsStorage:
+    """
+    Storage backend on the live Google Sheet.
+
+    All backends share the same small interface: tab values are plain lists of
+    rows (header first) and cells are addressed with 1-based (row, col) pairs.
+    Every backend counts its calls per method in `api_calls`.
+    """
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self.cache_key = spreadsheet.id
+        self.api_calls = Counter()
+
+    @classmethod
+    def connect(cls, creds_file='creds.json'):
+        """Connects to the Google Sheet. Returns None if the connection fails."""
+        # Imported here so that the local backend works without the Google client libraries.
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        try:
+            scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+            creds = ServiceAccountCredentials.from_json_keyfile_name(creds_file, scope)
+            client = gspread.authorize(creds)
+            spreadsheet = client.open(config.SHEET_NAME)
+            print("✅ Successfully connected to the Google Sheet.")
+            return cls(spreadsheet)
+        except Exception as e:
+            print(f"❌ Error connecting to Google Sheet: {e}")
+            return None
+
+    def revision(self):
+        self.api_calls['revision'] += 1
+        return self.spreadsheet.get_lastUpdateTime()
+
+    def fetch_values(self, tabs):
+        """Fetches several tabs in one batched request. Returns {tab: rows}. Missing tabs are created empty."""
+        import gspread
+        self.api_calls['fetch_values'] += 1
+        try:
+            response = self.spreadsheet.values_batch_get([f"'{tab}'" for tab in tabs])
+        except gspread.exceptions.APIError:
+            # One missing tab fails the whole batch, e.g. Token_Transfers on a sheet set up before it existed
+            if not self._add_missing_tabs(tabs):
+                raise
+            self.api_calls['fetch_values'] += 1
+            response = self.spreadsheet.values_batch_get([f"'{tab}'" for tab in tabs])
+        return {
+            tab: value_range.get('values', [])
+            for tab, value_range in zip(tabs, response.get('valueRanges', []))
+        }
+
+    def _add_missing_tabs(self, tabs):
+        """Adds an empty worksheet for each of `tabs` the spreadsheet lacks. Returns the added tabs."""
+        self.api_calls['worksheets'] += 1
+        existing = {worksheet.title for worksheet in self.spreadsheet.worksheets()}
+        missing = [tab for tab in tabs if tab not in existing]
+        for tab in missing:
+            self.api_calls['add_worksheet'] += 1
+            self.spreadsheet.add_worksheet(tab, rows=1000, cols=26)
+            print(f"⚠️ Tab '{tab}' was missing. Added it empty.")
+        return missing
+
+    def fetch_tab(self, tab):
+        self.api_calls['fetch_tab'] += 1
+        return self.spreadsheet.values_get(f"'{tab}'").get('values', [])
+
+    def fetch_rows(self, tab, first_row):
+        """Rows of a tab from `first_row` (1-based) to the end."""
+        self.api_calls['fetch_rows'] += 1
+        return self.spreadsheet.values_get(f"'{tab}'!A{first_row}:ZZ").get('values', [])
+
+    def update(self, tab, values, start='A1'):
+        self.api_calls['update'] += 1
+        self.spreadsheet.worksheet(tab).update(values, start)
+
+    def append_rows(self, tab, rows):
+        """Writes rows after the last row of the tab, as the API finds it. Returns the first row written."""
+        self.api_calls['append_rows'] += 1
+        response = self.spreadsheet.values_append(
+            f"'{tab}'!A1", {'valueInputOption': 'RAW', 'insertDataOption': 'INSERT_ROWS'}, {'values': rows}
+        )
+        updated_range = response['updates']['updatedRange']  # e.g. "'Offers'!A12:H14"
+        return a1_to_rowcol(updated_range.split('!')[-1].split(':')[0])[0]
+
+    def update_cells(self, tab, cells):
+        """Writes [(row, col, value)] cells in one request."""
+        self.api_calls['update_cells'] += 1
+        import gspread
+        self.spreadsheet.worksheet(tab).update_cells([gspread.Cell(row, col, value) for row, col, value in cells])
+
+    def batch_update(self, blocks):
+        """Writes [(tab, row, col, rows)] blocks of values in a single request."""
+        self.api_calls['batch_update'] += 1
+        self.spreadsheet.values_batch_update({
+            'valueInputOption': 'RAW',
+            'data': [{'range': f"'{tab}'!{rowcol_to_a1(row, col)}", 'values': values} for tab, row, col, values in blocks],
+        })
+
+
+class LocalStorage:
+    """
+    SQLite storage backend with the same interface as GoogleSheetsStorage.
+
+    Each tab is stored as numbered rows of JSON-encoded cells. With the default
+    ':memory:' path nothing touches the disk, which makes it suitable for
+    offline runs, replays of production snapshots and benchmarks.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.cache_key = None  # Already local: no snapshot cache needed
+        self.api_calls = Counter()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tab_rows (tab TEXT, row INTEGER, cells TEXT, PRIMARY KEY (tab, row))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+        print(f"✅ Using local storage '{path}'.")
+
+    def revision(self):
+        self.api_calls['revision'] += 1
+        return self._revision()
+
+    def _revision(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return row[0] if row else '0'
+
+    def _bump_revision(self):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', ?)", (str(int(self._revision()) + 1),))
+        self.conn.commit()
+
+    def fetch_values(self, tabs):
+        self.api_calls['fetch_values'] += 1
+        return {tab: self._fetch_tab(tab) for tab in tabs}
+
+    def fetch_tab(self, tab):
+        self.api_calls['fetch_tab'] += 1
+        return self._fetch_tab(tab)
+
+    def _fetch_tab(self, tab):
+        rows = []
+        for row, cells in self.conn.execute("SELECT row, cells FROM tab_rows WHERE tab = ? ORDER BY row", (tab,)):
+            rows.extend([] for _ in range(row - 1 - len(rows)))
+            rows.append(json.loads(cells))
+        return rows
+
+    def fetch_rows(self, tab, first_row):
+        self.api_calls['fetch_rows'] += 1
+        rows = []
+        for row, cells in self.conn.execute("SELECT row, cells FROM tab_rows WHERE tab = ? AND row >= ? ORDER BY row", (tab, first_row)):
+            rows.extend([] for _ in range(row - first_row - len(rows)))
+            rows.append(json.loads(cells))
+        return rows
+
+    def _read_row(self, tab, row):
+        result = self.conn.execute("SELECT cells FROM tab_rows WHERE tab = ? AND row = ?", (tab, row)).fetchone()
+        return json.loads(result[0]) if result else []
+
+    def _write_row(self, tab, row, cells):
+        self.conn.execute("INSERT OR REPLACE INTO tab_rows (tab, row, cells) VALUES (?, ?, ?)", (tab, row, json.dumps(cells)))
+
+    def _set_cells(self, tab, cells):
+        by_row = {}
+        for row, col, value in cells:
+            by_row.setdefault(row, []).append((col, value))
+        for row, row_cells in by_row.items():
+            current = self._read_row(tab, row)
+            for col, value in row_cells:
+                current.extend([''] * (col - len(current)))
+                current[col - 1] = value
+            self._write_row(tab, row, current)
+        self._bump_revision()
+
+    def update(self, tab, values, start='A1'):
+        self.api_calls['update'] += 1
+        start_row, start_col = a1_to_rowcol(start)
+        self._set_cells(tab, [
+            (start_row + r, start_col + c, value)
+            for r, row in enumerate(values) for c, value in enumerate(row)
+        ])
+
+    def append_rows(self, tab, rows):
+        self.api_calls['append_rows'] += 1
+        last_row = self.conn.execute("SELECT COALESCE(MAX(row), 0) FROM tab_rows WHERE tab = ?", (tab,)).fetchone()[0]
+        for offset, row in enumerate(rows, start=1):
+            self._write_row(tab, last_row + offset, list(row))
+        self._bump_revision()
+        return last_row + 1
+
+    def update_cells(self, tab, cells):
+        self.api_calls['update_cells'] += 1
+        self._set_cells(tab, cells)
+
+    def batch_update(self, blocks):
+        self.api_calls['batch_update'] += 1
+        by_tab = {}
+        for tab, start_row, start_col, values in blocks:
+            by_tab.setdefault(tab, []).extend(
+                (start_row + r, start_col + c, value)
+                for r, row in enumerate(values) for c, value in enumerate(row)
+            )
+        for tab, cells in by_tab.items():
+            self._set_cells(tab, cells)
+
+    def load_tab(self, tab, values):
+        """Replaces a whole tab with the given rows (header first)."""
+        self.conn.execute("DELETE FROM tab_rows WHERE tab = ?", (tab,))
+        for row, cells in enumerate(values, start=1):
+            self._write_row(tab, row, list(cells))
+        self._bump_revision()
+
+    def import_snapshot(self, path):
+        """Replays a snapshot file written by SheetSnapshot (see config.SNAPSHOT_DIR)."""
+        with open(path) as f:
+            snapshot = json.load(f)
+        for tab, values in snapshot['values'].items():
+            self.load_tab(tab, values)
+        print(f"✅ Imported {len(snapshot['values'])} tabs from snapshot '{path}'.")
+
+    def import_jsonl(self, path):
+        """
+        Imports records from a JSON-lines file. Each line is an object with a
+        'tab' key; its other keys are the column values of one row of that tab.
+        """
+        records_by_tab = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records_by_tab.setdefault(record.pop('tab'), []).append(record)
+        for tab, records in records_by_tab.items():
+            header = list(dict.fromkeys(key for record in records for key in record))
+            self.load_tab(tab, [header] + [[record.get(key, '') for key in header] for record in records])
+        print(f"✅ Imported {sum(len(r) for r in records_by_tab.values())} rows from '{path}'.")
+
+
+def open_local_storage(path):
+    """
+    Opens a LocalStorage from a path: an in-memory database seeded from a
+    JSON-lines file (.jsonl) or a snapshot file (.json), or a SQLite database.
+    """
+    if path.endswith('.jsonl'):
+        storage = LocalStorage()
+        storage.import_jsonl(path)
+    elif path.endswith('.json'):
+        storage = LocalStorage()
+        storage.import_snapshot(path)
+    else:
+        storage = LocalStorage(path)
+    return storage
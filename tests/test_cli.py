@@ -0,0 +1,14 @@
+import pytest
+import cli
+import config
+
+
+@pytest.mark.parametrize('command', sorted(config.CLI_DEFERRED_MODULES))
+def test_startup_defers_heavy_modules(command):
+    _, loaded = cli.measure_startup(command, repeat=1)
+    assert loaded == []
+
+
+def test_unknown_command_prints_usage(capsys):
+    assert cli.main(['nope']) == 2
+    assert 'Usage:' in capsys.readouterr().out
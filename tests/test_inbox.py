@@ -0,0 +1,119 @@
+import re
+import socketserver
+import threading
+import time
+import pytest
+import config
+import reply_daemon
+from inbox import ReplyInbox
+
+
+class FakeImapHandler(socketserver.StreamRequestHandler):
+    """A minimal IMAP server: LOGIN, SELECT, UID SEARCH/FETCH/STORE, IDLE and LOGOUT."""
+
+    def send(self, data):
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def handle(self):
+        messages = self.server.messages  # [[uid, subject, seen]]
+        self.send(b'* OK ready\r\n')
+        for line in self.rfile:
+            tag, command, rest = (line.decode().strip().split(' ', 2) + [''])[:3]
+            command = command.upper()
+            if command == 'CAPABILITY':
+                self.send(f'* CAPABILITY IMAP4rev1 IDLE\r\n{tag} OK done\r\n'.encode())
+            elif command == 'LOGIN':
+                self.send(f'{tag} OK done\r\n'.encode())
+            elif command == 'SELECT':
+                self.send(f'* {len(messages)} EXISTS\r\n* OK [UIDVALIDITY 7] x\r\n{tag} OK [READ-WRITE] done\r\n'.encode())
+            elif command == 'IDLE':
+                # The continuation and the new-mail notice arrive in a single packet
+                self.send(b'+ idling\r\n' + (b'* 9 EXISTS\r\n' if self.server.new_mail_on_idle else b''))
+                self.rfile.readline()  # DONE
+                self.send(f'{tag} OK IDLE terminated\r\n'.encode())
+            elif command == 'LOGOUT':
+                self.send(f'* BYE\r\n{tag} OK done\r\n'.encode())
+                return
+            elif command == 'UID':
+                subcommand, args = rest.split(' ', 1)
+                uids = {int(uid) for uid in re.findall(r'\d+', args.split(' ')[0])}
+                if subcommand.upper() == 'SEARCH':
+                    match = re.search(r'UID (\d+):\*', args)
+                    low = int(match.group(1)) if match else 0
+                    found = [str(uid) for uid, subject, seen in messages if not seen and uid >= low and subject.startswith(('ACCEPT-', 'DECLINE-'))]
+                    self.send(f'* SEARCH {" ".join(found)}\r\n{tag} OK done\r\n'.encode())
+                elif subcommand.upper() == 'FETCH':
+                    for number, (uid, subject, _) in enumerate(messages, start=1):
+                        if uid in uids:
+                            header = f'Subject: {subject}\r\n\r\n'.encode()
+                            self.send(f'* {number} FETCH (UID {uid} BODY[HEADER.FIELDS (SUBJECT)] {{{len(header)}}}\r\n'.encode() + header + b')\r\n')
+                    self.send(f'{tag} OK done\r\n'.encode())
+                else:  # STORE +FLAGS \Seen
+                    for message in messages:
+                        message[2] = message[2] or message[0] in uids
+                    self.send(f'{tag} OK done\r\n'.encode())
+            else:
+                self.send(f'{tag} BAD unknown\r\n'.encode())
+
+
+@pytest.fixture
+def imap_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeImapHandler)
+    server.daemon_threads = True
+    server.messages = [[3, 'Hello', False], [5, 'ACCEPT-o1', False], [6, 'DECLINE-o2', False]]
+    server.new_mail_on_idle = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def connect(server):
+    return ReplyInbox('hr@example.com', 'secret', host='127.0.0.1', port=server.server_address[1], use_ssl=False).connect()
+
+
+def test_fetches_replies_after_the_watermark(imap_server):
+    inbox = connect(imap_server)
+    replies, watermark = inbox.fetch_new_replies('7:5')
+    assert replies == [(6, 'DECLINE-o2')] and watermark == '7:6'
+
+    inbox.mark_seen([6])
+    assert inbox.fetch_new_replies('other:0') == ([(5, 'ACCEPT-o1')], '7:5')
+    assert inbox.watermark_before(5) == '7:4'
+    inbox.logout()
+
+
+def test_idle_sees_new_mail_already_buffered(imap_server):
+    imap_server.new_mail_on_idle = True
+    inbox = connect(imap_server)
+    started = time.monotonic()
+    assert inbox.idle(timeout=5) is True
+    assert time.monotonic() - started < 1  # Did not wait in select() for data it already had
+    inbox.logout()
+
+
+def test_idle_times_out_without_new_mail(imap_server):
+    inbox = connect(imap_server)
+    assert inbox.idle(timeout=0.2) is False
+    inbox.logout()
+
+
+def test_daemon_backs_off_on_sheet_errors(monkeypatch):
+    daemon = reply_daemon.ReplyDaemon(storage=None)
+    daemon.offers = object()
+    failures = [RuntimeError('Sheets API quota exceeded'), OSError('connection reset')]
+    sleeps = []
+
+    def connect():
+        if not failures:
+            raise KeyboardInterrupt
+        raise failures.pop(0)
+
+    monkeypatch.setattr(daemon, 'connect', connect)
+    monkeypatch.setattr(reply_daemon.time, 'sleep', sleeps.append)
+    with pytest.raises(KeyboardInterrupt):
+        daemon.run()
+
+    assert len(sleeps) == 2 and sleeps[1] > sleeps[0] >= config.REPLY_DAEMON_BACKOFF_SECONDS
+    assert daemon.offers is None
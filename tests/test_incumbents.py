@@ -0,0 +1,42 @@
+import pytest
+import benchmark
+import config
+from schedule_solver import incumbent_path, load_incumbents, save_incumbent
+from scheduler_class import Scheduler
+from storage import LocalStorage
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'INCUMBENT_DIR', str(tmp_path))
+    storage = LocalStorage()
+    for tab, values in benchmark.generate_tables(num_employees=12, num_shifts=4).items():
+        storage.load_tab(tab, values)
+    return Scheduler(storage=storage, today=benchmark.DEFAULT_TODAY)
+
+
+def save_role(scheduler, problem, role, horizon_start=None):
+    """Saves the carried assignments of one role as that role's incumbent."""
+    solution = {key: employee for key, employee in problem['official_assignments'].items() if problem['shifts'][key[0]]['role'] == role}
+    save_incumbent(incumbent_path(role), solution, 0, 0,
+                   horizon_start=horizon_start or scheduler.horizon.dates[0].isoformat(), num_days=problem['num_days'], roles=[role])
+
+
+def test_roles_without_incumbent_keep_the_carried_schedule(scheduler):
+    problem = scheduler.build_problem()
+    roles = sorted({shift['role'] for shift in problem['shifts'].values()})
+    assert len(roles) > 1
+    save_role(scheduler, problem, roles[0])
+
+    sandbox = scheduler.load_incumbent_solution()
+
+    assert sandbox.changes_from(scheduler._carried_schedule()) == []
+
+
+def test_incumbents_of_another_horizon_are_not_loaded(scheduler):
+    problem = scheduler.build_problem()
+    role = next(iter(problem['shifts'].values()))['role']
+    save_role(scheduler, problem, role, horizon_start='2025-09-01')
+
+    assert load_incumbents(scheduler.horizon.dates[0].isoformat(), problem['num_days']) == (None, set())
+    assert scheduler.load_incumbent_solution() is None
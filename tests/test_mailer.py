@@ -0,0 +1,61 @@
+import socket
+import threading
+import pytest
+from aiosmtpd.controller import Controller
+from mailer import Mailer, SmtpPool
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.messages.append((envelope.rcpt_tos[0], envelope.content.decode()))
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = Inbox()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def outgoing(count):
+    return [(f"n{i}@example.com", f"Offer {i}", f"Body {i}") for i in range(count)]
+
+
+def test_send_many_delivers_in_order_over_pooled_sessions(smtp_server, capsys):
+    controller, handler = smtp_server
+    pool = SmtpPool('hr@example.com', None, host='127.0.0.1', port=controller.port, size=3, use_ssl=False)
+    mailer = Mailer('hr@example.com', None, pool=pool)
+
+    deliveries = mailer.send_many(outgoing(10))
+    mailer.close()
+
+    assert [d.recipient for d in deliveries] == [f"n{i}@example.com" for i in range(10)]
+    assert all(d.ok for d in deliveries)
+    assert sorted(recipient for recipient, _ in handler.messages) == sorted(d.recipient for d in deliveries)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(' to ')[1].split(' ')[0] for line in lines] == [d.recipient for d in deliveries]
+
+
+def test_dry_run_prints_every_message_in_order(capsys):
+    mailer = Mailer('hr@example.com', None, dry_run=True)
+
+    deliveries = mailer.send_many(outgoing(20))
+
+    assert all(d.ok for d in deliveries)
+    assert capsys.readouterr().out.splitlines() == [
+        f"DRY RUN: Would send email to n{i}@example.com with subject 'Offer {i}'." for i in range(20)
+    ]
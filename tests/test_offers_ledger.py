@@ -0,0 +1,34 @@
+import config
+from offers_ledger import OffersLedger
+from storage import LocalStorage
+
+HEADER = [config.COL_OFFER_ID, config.COL_OFFER_EMPLOYEE, config.COL_OFFER_STATUS, config.COL_OFFER_REQUESTER]
+
+
+def offers_storage(rows):
+    storage = LocalStorage()
+    storage.load_tab(config.OFFERS_TAB, [HEADER] + rows)
+    return storage
+
+
+def test_refresh_reads_only_from_the_watermark():
+    storage = offers_storage([['o1', 'N0', 'ACCEPTED', 'R'], ['o2', 'N1', 'DECLINED', 'R'], ['o3', 'N2', 'PENDING', 'R']])
+    ledger = OffersLedger.load(storage, storage.revision())
+    assert ledger.watermark == 3
+
+    storage.append_rows(config.OFFERS_TAB, [['o4', 'N3', 'PENDING', 'R']])
+    assert ledger.refresh(storage, storage.revision()) == 3  # The watermark row, o3 and o4
+    assert ledger.row('o4') == 5 and ledger.status('o3') == 'PENDING'
+
+
+def test_refresh_reloads_when_the_settled_rows_changed():
+    storage = offers_storage([['o1', 'N0', 'ACCEPTED', 'R'], ['o2', 'N1', 'DECLINED', 'R'], ['o3', 'N2', 'PENDING', 'R']])
+    ledger = OffersLedger.load(storage, storage.revision())
+
+    # Someone deleted the first offer by hand: every row moved up by one
+    storage.load_tab(config.OFFERS_TAB, [HEADER, ['o2', 'N1', 'DECLINED', 'R'], ['o3', 'N2', 'ACCEPTED', 'R']])
+    ledger.refresh(storage, storage.revision())
+
+    assert ledger.rows == storage.fetch_tab(config.OFFERS_TAB)
+    assert ledger.row('o1') is None and ledger.row('o2') == 2 and ledger.status('o3') == 'ACCEPTED'
+    assert ledger.first_accepted('R')[config.COL_OFFER_ID] == 'o3'
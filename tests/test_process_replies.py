@@ -0,0 +1,49 @@
+import pytest
+import benchmark
+import config
+from scheduler_class import Scheduler
+from storage import LocalStorage
+
+
+class StubInbox:
+    """A connected ReplyInbox stand-in that records the UIDs marked as Seen."""
+    uidvalidity = 7
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.seen = []
+
+    def fetch_new_replies(self, watermark):
+        return self.replies, f"{self.uidvalidity}:{max(uid for uid, _ in self.replies)}"
+
+    def watermark_before(self, uid):
+        return f"{self.uidvalidity}:{uid - 1}"
+
+    def mark_seen(self, uids):
+        self.seen.extend(uids)
+
+
+@pytest.fixture
+def storage():
+    storage = LocalStorage()
+    tables = benchmark.generate_tables(num_employees=12, num_shifts=4)
+    employee = tables[config.EMPLOYEES_TAB][1][0]
+    offer = dict.fromkeys(benchmark.OFFERS_HEADER, '')
+    offer.update({config.COL_OFFER_ID: 'expired-1', config.COL_OFFER_EMPLOYEE: employee, config.COL_OFFER_STATUS: 'EXPIRED'})
+    tables[config.OFFERS_TAB] = [benchmark.OFFERS_HEADER, [offer[name] for name in benchmark.OFFERS_HEADER]]
+    for tab, values in tables.items():
+        storage.load_tab(tab, values)
+    return storage
+
+
+@pytest.mark.parametrize('dry_run', [True, False])
+def test_replies_to_expired_offers_are_marked_seen_only_for_real(storage, dry_run, monkeypatch):
+    monkeypatch.setenv('GMAIL_ADDRESS', 'hr@example.com')
+    monkeypatch.setenv('GMAIL_APP_PASSWORD', 'unused')
+    scheduler = Scheduler(storage=storage, today=benchmark.DEFAULT_TODAY, dry_run=dry_run)
+    inbox = StubInbox([(5, 'ACCEPT-expired-1')])
+
+    with scheduler.writes.transaction():
+        scheduler.process_email_replies(inbox)
+
+    assert inbox.seen == ([] if dry_run else [5])
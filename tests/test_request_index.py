@@ -0,0 +1,40 @@
+import pytest
+import benchmark
+import config
+from scheduler_class import Scheduler
+from storage import LocalStorage
+
+
+def scheduler_on(tables, groups=None):
+    storage = LocalStorage()
+    for tab, values in tables.items():
+        storage.load_tab(tab, values)
+    return Scheduler(groups=groups, storage=storage, today=benchmark.DEFAULT_TODAY)
+
+
+@pytest.fixture
+def tables():
+    return benchmark.generate_tables(num_employees=12, num_shifts=4)
+
+
+def test_empty_requests_tab_builds_a_problem_without_requests(tables):
+    tables[config.REQUESTS_TAB] = tables[config.REQUESTS_TAB][:1]  # Header only
+
+    problem = scheduler_on(tables).build_problem()
+
+    assert problem['requests'] == []
+    assert problem['employee_roles']
+
+
+def test_group_without_requests_builds_a_problem_without_requests(tables):
+    employees = tables[config.EMPLOYEES_TAB]
+    name_col, role_col = employees[0].index(config.COL_EMPLOYEE_NAME), employees[0].index(config.COL_EMPLOYEE_ROLE)
+    roles = {row[name_col]: row[role_col] for row in employees[1:]}
+    requested_role = benchmark.ROLES[0]
+    header, *rows = tables[config.REQUESTS_TAB]
+    tables[config.REQUESTS_TAB] = [header] + [row for row in rows if roles[row[0]] == requested_role]
+    assert len(tables[config.REQUESTS_TAB]) > 1
+
+    problem = scheduler_on(tables, groups=[benchmark.ROLES[1]]).build_problem()
+
+    assert problem['requests'] == []
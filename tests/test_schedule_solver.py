@@ -0,0 +1,31 @@
+import multiprocessing
+import time
+import schedule_solver
+
+
+def fake_solve(problem, time_limit=None, num_workers=None, label='all', horizon_start=None):
+    """Stands in for solve_schedule in the worker processes: one role is infeasible, the other runs long."""
+    if label == 'slow':
+        time.sleep(60)
+        return 'FEASIBLE', {}, dict(label=label)
+    return 'INFEASIBLE', None, dict(label=label)
+
+
+def test_a_failed_role_does_not_wait_for_the_others(monkeypatch):
+    problem = dict(
+        employee_roles={'A': 'fast', 'B': 'slow'},
+        shifts={'S1': {'duration': 800, 'role': 'fast', 'days': [0]}, 'S2': {'duration': 800, 'role': 'slow', 'days': [0]}},
+        num_days=7,
+    )
+    monkeypatch.setattr(schedule_solver, 'solve_schedule', fake_solve)  # Inherited by the forked workers
+
+    started = time.monotonic()
+    solution, stats = schedule_solver.solve_by_role(problem)
+
+    assert solution is None and [s['label'] for s in stats] == ['fast']
+    assert time.monotonic() - started < 10
+    # The long solve was terminated rather than left running until the interpreter exits
+    deadline = time.monotonic() + 5
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not multiprocessing.active_children()
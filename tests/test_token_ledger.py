@@ -0,0 +1,104 @@
+import gspread
+import config
+from sheet_snapshot import SheetSnapshot
+from storage import GoogleSheetsStorage, LocalStorage
+from token_ledger import TRANSFERS_HEADER, TokenLedger
+from write_buffer import WriteBuffer
+
+EMPLOYEES = [
+    [config.COL_EMPLOYEE_NAME, config.COL_EMPLOYEE_EMAIL, config.COL_EMPLOYEE_ROLE, config.COL_EMPLOYEE_TOKENS, '', 'Tokens_Copy'],
+    ['N0', 'n0@x', 'Infirmier', 10, '', 10],
+    ['N1', 'n1@x', 'Infirmier', 10, '', 10],
+]
+
+
+def redistribute(storage, offer_id):
+    """One run's redistribution: a fresh snapshot, ledger and flushed WriteBuffer."""
+    snapshot = SheetSnapshot.load(storage, [config.EMPLOYEES_TAB, config.TOKEN_TRANSFERS_TAB])
+    writes = WriteBuffer(storage, snapshot)
+    ledger = TokenLedger(snapshot)
+    applied = ledger.transfer(offer_id, 'N0', 'N1', 7)
+    changed = ledger.write(writes)
+    writes.flush()
+    return applied, changed
+
+
+def test_reprocessing_an_accepted_offer_moves_tokens_once():
+    storage = LocalStorage()
+    storage.load_tab(config.EMPLOYEES_TAB, EMPLOYEES)
+
+    assert redistribute(storage, 'offer-1') == (True, 2)
+    assert redistribute(storage, 'offer-1') == (False, 0)
+
+    transfers = storage.fetch_tab(config.TOKEN_TRANSFERS_TAB)
+    assert transfers[0] == TRANSFERS_HEADER
+    assert [row[:4] for row in transfers[1:]] == [['offer-1', 'N0', 'N1', 7]]
+    balances = {row[0]: (row[3], row[5]) for row in storage.fetch_tab(config.EMPLOYEES_TAB)[1:]}
+    assert balances == {'N0': (3, 3), 'N1': (17, 17)}
+
+
+class FakeResponse:
+    status_code = 400
+
+    def json(self):
+        return {'error': {'code': 400, 'message': 'Unable to parse range', 'status': 'INVALID_ARGUMENT'}}
+
+
+class FakeWorksheet:
+    def __init__(self, title):
+        self.title = title
+
+
+class FakeSpreadsheet:
+    """A spreadsheet whose batch get fails, like the Sheets API, while a requested tab is missing."""
+    id = 'fake'
+
+    def __init__(self, values):
+        self.values = values
+
+    def worksheets(self):
+        return [FakeWorksheet(tab) for tab in self.values]
+
+    def add_worksheet(self, title, rows, cols):
+        self.values[title] = []
+
+    def values_batch_get(self, ranges):
+        tabs = [r.strip("'") for r in ranges]
+        if any(tab not in self.values for tab in tabs):
+            raise gspread.exceptions.APIError(FakeResponse())
+        return {'valueRanges': [{'values': self.values[tab]} if self.values[tab] else {} for tab in tabs]}
+
+
+def test_missing_transfers_tab_is_added_empty():
+    spreadsheet = FakeSpreadsheet({config.EMPLOYEES_TAB: EMPLOYEES})
+    storage = GoogleSheetsStorage(spreadsheet)
+
+    values = storage.fetch_values([config.EMPLOYEES_TAB, config.TOKEN_TRANSFERS_TAB])
+
+    assert values == {config.EMPLOYEES_TAB: EMPLOYEES, config.TOKEN_TRANSFERS_TAB: []}
+    assert spreadsheet.values[config.TOKEN_TRANSFERS_TAB] == []
+    assert storage.api_calls['add_worksheet'] == 1
+
+
+class FailingBatchStorage(LocalStorage):
+    """Local storage whose batched cell writes fail, like a Sheets API error after the append went through."""
+
+    def batch_update(self, blocks):
+        raise RuntimeError('quota exceeded')
+
+
+def test_a_failed_flush_never_moves_balances_without_a_journal_row():
+    storage = FailingBatchStorage()
+    storage.load_tab(config.EMPLOYEES_TAB, EMPLOYEES)
+    try:
+        redistribute(storage, 'offer-1')
+    except RuntimeError:
+        pass
+
+    # The transfer is under-applied at worst: journaled, and never paid again by the next run
+    assert [row[0] for row in storage.fetch_tab(config.TOKEN_TRANSFERS_TAB)[1:]] == ['offer-1']
+    assert [row[3] for row in storage.fetch_tab(config.EMPLOYEES_TAB)[1:]] == [10, 10]
+    healthy = LocalStorage()
+    for tab in (config.EMPLOYEES_TAB, config.TOKEN_TRANSFERS_TAB):
+        healthy.load_tab(tab, storage.fetch_tab(tab))
+    assert redistribute(healthy, 'offer-1') == (False, 0)
@@ -0,0 +1,35 @@
+import config
+from sheet_snapshot import SheetSnapshot
+from storage import LocalStorage
+from write_buffer import WriteBuffer
+
+HEADER = [config.COL_OFFER_ID, config.COL_OFFER_EMPLOYEE, config.COL_OFFER_STATUS]
+
+
+def test_appends_from_stale_snapshots_do_not_overwrite_each_other():
+    storage = LocalStorage()
+    storage.load_tab(config.OFFERS_TAB, [HEADER, ['o1', 'N0', 'PENDING']])
+    first = WriteBuffer(storage, SheetSnapshot.load(storage, [config.OFFERS_TAB]))
+    second = WriteBuffer(storage, SheetSnapshot.load(storage, [config.OFFERS_TAB]))
+
+    first.append_rows(config.OFFERS_TAB, [['o2', 'N1', 'PENDING']])
+    second.append_rows(config.OFFERS_TAB, [['o3', 'N2', 'PENDING']])
+    first.flush()
+    second.flush()
+
+    assert [row[0] for row in storage.fetch_tab(config.OFFERS_TAB)] == [config.COL_OFFER_ID, 'o1', 'o2', 'o3']
+    # The second run's ledger is re-read from the sheet instead of keeping its guessed row
+    assert second.offers.revision is None
+
+
+def test_cell_updates_stay_positional():
+    storage = LocalStorage()
+    storage.load_tab(config.OFFERS_TAB, [HEADER, ['o1', 'N0', 'PENDING'], ['o2', 'N1', 'PENDING']])
+    writes = WriteBuffer(storage, SheetSnapshot.load(storage, [config.OFFERS_TAB]))
+
+    writes.update_cells(config.OFFERS_TAB, [(writes.offers.row('o2'), 3, 'ACCEPTED')])
+    writes.append_rows(config.OFFERS_TAB, [['o3', 'N2', 'PENDING']])
+    writes.flush()
+
+    assert storage.fetch_tab(config.OFFERS_TAB)[1:] == [['o1', 'N0', 'PENDING'], ['o2', 'N1', 'ACCEPTED'], ['o3', 'N2', 'PENDING']]
+    assert storage.api_calls['batch_update'] == 1 and storage.api_calls['append_rows'] == 1
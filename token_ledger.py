@@ -0,0 +1,68 @@
+from datetime import datetime
+import config
+from sheet_snapshot import numericise
+
+TRANSFERS_HEADER = [config.COL_TRANSFER_OFFER_ID, config.COL_TRANSFER_FROM, config.COL_TRANSFER_TO, config.COL_TRANSFER_TOKENS, config.COL_TRANSFER_TIME]
+
+
+class TokenLedger:
+    """
+    Token balances of the Employees tab and the journal of the transfers between them.
+
+    Each transfer is appended to the Token_Transfers tab under the id of the
+    accepted offer that earned it, and an offer id already in the journal is
+    never applied twice, so re-running the redistribution (the hourly
+    process_replies run, or a run retried after a failure) does not move the
+    same tokens again. Balances are kept in memory with a name -> row index,
+    and `write` queues only the balances that changed, together with the new
+    journal rows, on the run's WriteBuffer.
+    """
+
+    def __init__(self, snapshot):
+        employee_rows = snapshot.values(config.EMPLOYEES_TAB)
+        header = employee_rows[0] if employee_rows else []
+        name_col = header.index(config.COL_EMPLOYEE_NAME) if config.COL_EMPLOYEE_NAME in header else 0
+        tokens_col = header.index(config.COL_EMPLOYEE_TOKENS) if config.COL_EMPLOYEE_TOKENS in header else config.EMPLOYEE_TOKEN_COLUMNS[0] - 1
+        self.rows = {}  # {employee: sheet row}
+        self.balances = {}
+        for row_index, row in enumerate(employee_rows[1:], start=2):
+            if len(row) > name_col and row[name_col] != '':
+                self.rows[row[name_col]] = row_index
+                self.balances[row[name_col]] = numericise(row[tokens_col]) if len(row) > tokens_col else 0
+
+        transfer_rows = snapshot.values(config.TOKEN_TRANSFERS_TAB)
+        id_col = transfer_rows[0].index(config.COL_TRANSFER_OFFER_ID) if transfer_rows else 0
+        self.recorded = {row[id_col] for row in transfer_rows[1:] if len(row) > id_col}
+        self._changed = set()
+        self._entries = []
+
+    def transfer(self, offer_id, from_employee, to_employee, tokens):
+        """Moves `tokens` once per offer id. Returns False if the offer was already paid or an employee is unknown."""
+        if offer_id in self.recorded:
+            return False
+        for employee in (from_employee, to_employee):
+            if employee not in self.balances:
+                print(f"⚠️ Unknown employee '{employee}' in the transfer for offer {offer_id}. Skipping it.")
+                return False
+        self.balances[from_employee] -= tokens
+        self.balances[to_employee] += tokens
+        self._changed.update((from_employee, to_employee))
+        self.recorded.add(offer_id)
+        self._entries.append([offer_id, from_employee, to_employee, tokens, datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+        return True
+
+    def write(self, writes):
+        """Queues the new journal rows and the changed balances. Returns the number of balances written."""
+        cells = [
+            (self.rows[employee], col, self.balances[employee])
+            for employee in sorted(self._changed) for col in config.EMPLOYEE_TOKEN_COLUMNS
+        ]
+        if cells:
+            writes.update_cells(config.EMPLOYEES_TAB, cells)
+        if self._entries:
+            header = [] if writes.snapshot.values(config.TOKEN_TRANSFERS_TAB) else [TRANSFERS_HEADER]
+            writes.append_rows(config.TOKEN_TRANSFERS_TAB, header + self._entries)
+        changed = len(self._changed)
+        self._changed = set()
+        self._entries = []
+        return changed
@@ -0,0 +1,79 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import time
+import config
+
+
+class Tracer:
+    """
+    Collects the timings and counters of one run and exports them as JSON.
+
+    Spans are named, nested phases timed with a monotonic clock (offsets are
+    relative to the start of the run); counters are plain named totals (API
+    calls, emails, replies); solver entries are the CP-SAT statistics of each
+    solve. Everything is kept in memory until `export`.
+    """
+
+    def __init__(self, run_name='run'):
+        self.run_name = run_name
+        self.started_at = datetime.now()
+        self._origin = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.solver_stats = []
+        self._open_spans = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Times the enclosed block as a span nested in the currently open one."""
+        record = {
+            'name': name,
+            'parent': self._open_spans[-1]['name'] if self._open_spans else None,
+            'start': time.perf_counter() - self._origin,
+            'duration': None,
+            'attributes': attributes,
+        }
+        self.spans.append(record)
+        self._open_spans.append(record)
+        try:
+            yield record['attributes']
+        except Exception as e:
+            record['attributes']['error'] = str(e)
+            raise
+        finally:
+            record['duration'] = time.perf_counter() - self._origin - record['start']
+            self._open_spans.pop()
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def count_all(self, prefix, counter):
+        """Adds every entry of `counter` as '<prefix>.<name>'."""
+        for name, value in counter.items():
+            self.counters[f"{prefix}.{name}"] += value
+
+    def record_solver(self, stats):
+        self.solver_stats.append(stats)
+
+    def to_dict(self):
+        return {
+            'run': self.run_name,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'duration': time.perf_counter() - self._origin,
+            'spans': self.spans,
+            'counters': dict(sorted(self.counters.items())),
+            'solver': self.solver_stats,
+        }
+
+    def export(self, path=None):
+        """Writes the trace to `path` (default: a timestamped file in config.TRACE_DIR). Returns the path."""
+        if path is None:
+            os.makedirs(config.TRACE_DIR, exist_ok=True)
+            path = os.path.join(config.TRACE_DIR, f"trace_{self.run_name}_{self.started_at:%Y%m%d_%H%M%S}.json")
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        print(f"✅ Trace written to '{path}'.")
+        return path
@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from offers_ledger import OffersLedger
+from sheet_snapshot import a1_to_rowcol
+from tracing import Tracer
+import config
+
+
+class WriteBuffer:
+    """
+    Queues every sheet mutation of a run and sends them in a single batch.
+
+    Writes are applied to the in-memory snapshot straight away, so the rest of
+    the run reads its own writes, and are coalesced per cell (the last write
+    wins) until `flush`. Appended rows are sent with the storage's append
+    instead of at a row number, so rows another run appended since the
+    snapshot was taken are never overwritten. Writes to the Offers tab go
+    through the OffersLedger, whose indexes locate offers by id instead of a
+    full-sheet search per reply.
+    """
+
+    def __init__(self, storage, snapshot, tracer=None, offers=None):
+        self.storage = storage
+        self.snapshot = snapshot
+        self.tracer = tracer or Tracer()
+        self._pending = {}  # {(tab, row, col): value}
+        self._appends = {}  # {tab: [row values]}, sent after the cell writes
+        self._original_values = {}  # {tab: rows} as they were before the first queued write
+        self._after_flush = []
+        self._offers = offers
+
+    def column(self, tab, name):
+        """1-based column of a header name."""
+        return self.snapshot.values(tab)[0].index(name) + 1
+
+    @property
+    def offers(self):
+        """The OffersLedger over the snapshot's Offers rows, built on first use if none was given."""
+        if self._offers is None:
+            self._offers = OffersLedger(self.snapshot.values(config.OFFERS_TAB))
+        return self._offers
+
+    def _remember(self, tab):
+        if tab not in self._original_values:
+            self._original_values[tab] = [list(row) for row in self.snapshot.values(tab)]
+
+    def update_cells(self, tab, cells):
+        """Queues [(row, col, value)] writes of existing cells."""
+        self._remember(tab)
+        for row, col, value in cells:
+            self._pending[(tab, row, col)] = value
+        self._apply(tab, cells)
+
+    def _apply(self, tab, cells):
+        if tab == config.OFFERS_TAB:
+            self.offers.set_cells(cells)
+        else:
+            self.snapshot.set_cells(tab, cells)
+
+    def update(self, tab, values, start='A1'):
+        """Queues a block of rows written from the `start` cell."""
+        start_row, start_col = a1_to_rowcol(start)
+        self.update_cells(tab, [
+            (start_row + r, start_col + c, value)
+            for r, row in enumerate(values) for c, value in enumerate(row)
+        ])
+
+    def append_rows(self, tab, rows):
+        """Queues rows appended to the tab. The snapshot gets them after its last row."""
+        self._remember(tab)
+        first_row = len(self.offers.rows if tab == config.OFFERS_TAB else self.snapshot.values(tab)) + 1
+        self._appends.setdefault(tab, []).extend(list(row) for row in rows)
+        self._apply(tab, [
+            (first_row + r, 1 + c, value)
+            for r, row in enumerate(rows) for c, value in enumerate(row)
+        ])
+
+    def after_flush(self, callback):
+        """Runs `callback` once the queued writes have been flushed."""
+        self._after_flush.append(callback)
+
+    def _blocks(self):
+        """Coalesces the pending cells into rectangular [(tab, row, col, rows)] blocks."""
+        runs = []  # Contiguous cells of one row: [tab, row, col, values]
+        for (tab, row, col), value in sorted(self._pending.items(), key=lambda item: (item[0][0], item[0][1], item[0][2])):
+            last = runs[-1] if runs else None
+            if last and last[0] == tab and last[1] == row and last[2] + len(last[3]) == col:
+                last[3].append(value)
+            else:
+                runs.append([tab, row, col, [value]])
+
+        blocks = []
+        for tab, row, col, values in runs:
+            last = blocks[-1] if blocks else None
+            if last and last[0] == tab and last[1] + len(last[3]) == row and last[2] == col and len(last[3][0]) == len(values):
+                last[3].append(values)
+            else:
+                blocks.append((tab, row, col, [values]))
+        return blocks
+
+    def flush(self):
+        """
+        Sends the appended rows in one append per tab, then the queued cell
+        writes in one batch, and runs the after-flush callbacks. Appends go
+        first so that a journal row (e.g. of Token_Transfers) is never missing
+        for a balance that was written: a partial failure can only leave an
+        entry whose cells were not updated.
+        """
+        for tab, rows in self._appends.items():
+            with self.tracer.span('append', tab=tab, rows=len(rows)):
+                first_row = self.storage.append_rows(tab, rows)
+            expected_row = len(self._original_values[tab]) + 1
+            if first_row != expected_row:
+                # Another run appended rows since the snapshot: re-read the tab rather than guess
+                print(f"⚠️ '{tab}' grew since it was read. Appended {len(rows)} rows at row {first_row} instead of {expected_row}.")
+                if tab == config.OFFERS_TAB:
+                    self.offers.revision = None
+                else:
+                    self.snapshot.invalidate(tab)
+            else:
+                print(f"✅ Appended {len(rows)} rows to '{tab}'.")
+        if self._pending:
+            blocks = self._blocks()
+            with self.tracer.span('flush', cells=len(self._pending), ranges=len(blocks)):
+                self.storage.batch_update(blocks)
+            print(f"✅ Flushed {len(self._pending)} cell updates ({len(blocks)} ranges) in a single batch.")
+        self._pending = {}
+        self._appends = {}
+        self._original_values = {}
+        callbacks, self._after_flush = self._after_flush, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        """Drops the queued writes and restores the snapshot to its state before them."""
+        for tab, rows in self._original_values.items():
+            if tab == config.OFFERS_TAB:
+                self.offers.reset(rows)
+                rows = self.offers.rows
+            self.snapshot.restore(tab, rows)
+        print(f"↩️ Rolled back {len(self._pending)} queued cell updates and {sum(len(rows) for rows in self._appends.values())} appended rows.")
+        self._pending = {}
+        self._appends = {}
+        self._original_values = {}
+        self._after_flush = []
+
+    @contextmanager
+    def transaction(self, rollback_on_error=None):
+        """
+        Flushes the queued writes when the block completes. If it raises, the
+        writes are rolled back when `rollback_on_error` (default
+        config.ROLLBACK_ON_FAILURE) is set, and flushed otherwise.
+        """
+        if rollback_on_error is None:
+            rollback_on_error = config.ROLLBACK_ON_FAILURE
+        try:
+            yield self
+        except Exception:
+            if rollback_on_error:
+                self.rollback()
+            else:
+                self.flush()
+            raise
+        self.flush()